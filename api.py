@@ -0,0 +1,111 @@
+"""Versioned JSON API of the point E calculations, served by the Flask server of the app.
+
+    GET  /api/v1/scenario     the default scenario, keyed by component ids
+    POST /api/v1/settlement   one scenario object, or an array of them
+
+Scenarios are keyed like the input of batch.py: the component ids of the
+app (input-factor, water-table, a, b, q, z-1, gamma_1, ..., OCR_3) or the
+Scenario field names, plus an optional id. Results have the fields of
+batch.py, with the preferred and reference profiles unless ?profiles=0, and
+the quadrature settlement with ?quadrature=1. A scenario that is not
+physically valid, or whose settlement is not finite, gets an error record
+{"id": ..., "error": ...} instead.
+
+A batch is evaluated with batch_profiles, so scenarios sharing their layer
+thicknesses are computed together. Ask for application/x-ndjson (in Accept,
+or with ?stream=1) to get one result per line as soon as its chunk of
+scenarios is done, instead of one JSON document at the end. A JSON document
+holds at most API_MAX_JSON_BATCH results, a stream up to API_MAX_BATCH.
+"""
+import json
+import os
+
+import flask
+
+from batch import finite_result, summarize
+from calculations import REFERENCE_STEP, Scenario, batch_profiles, calculate_quadrature
+
+# Most scenarios accepted in one streamed request
+API_MAX_BATCH = int(os.environ.get('API_MAX_BATCH', 100_000))
+
+# Most scenarios of a single JSON document, which is built in memory with all its profiles
+API_MAX_JSON_BATCH = int(os.environ.get('API_MAX_JSON_BATCH', 1000))
+
+# Scenarios per batch_profiles pass of a streamed response
+API_STREAM_CHUNK = int(os.environ.get('API_STREAM_CHUNK', 500))
+
+NDJSON = 'application/x-ndjson'
+
+api = flask.Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def _flag(name, default):
+    value = flask.request.args.get(name)
+    return default if value is None else value.lower() not in ('0', 'false', 'no')
+
+
+def parse_scenario(index, record):
+    """(id, Scenario, None) of a request record, or (id, None, error message)."""
+    if not isinstance(record, dict):
+        return str(index), None, 'TypeError: a scenario is a JSON object'
+    record = dict(record)
+    scenario_id = str(record.pop('id', index))
+    try:
+        scenario = Scenario.from_record(record)
+        # Checked up front, since one bad scenario would fail the whole batch pass
+        scenario.validate()
+    except (ValueError, TypeError) as e:
+        return scenario_id, None, f'{type(e).__name__}: {e}'
+    return scenario_id, scenario, None
+
+
+def evaluate(records, start=0, profiles=True, quadrature=False):
+    """Results of the request records, in order; record k gets the default id start + k."""
+    parsed = [parse_scenario(start + k, record) for k, record in enumerate(records)]
+    scenarios = [scenario for _, scenario, _ in parsed if scenario is not None]
+    pref = iter(batch_profiles(scenarios))
+    ref = iter(batch_profiles(scenarios, step=REFERENCE_STEP))
+
+    results = []
+    for scenario_id, scenario, error in parsed:
+        if scenario is None:
+            results.append({'id': scenario_id, 'error': error})
+        else:
+            results.append(finite_result(summarize(scenario_id, next(pref), next(ref),
+                                                   calculate_quadrature(scenario) if quadrature else None, profiles)))
+    return results
+
+
+@api.get('/scenario')
+def default_scenario():
+    return flask.jsonify(Scenario().to_record())
+
+
+@api.post('/settlement')
+def settlement():
+    body = flask.request.get_json(silent=True)
+    profiles = _flag('profiles', True)
+    quadrature = _flag('quadrature', False)
+
+    if isinstance(body, dict):
+        result, = evaluate([body], profiles=profiles, quadrature=quadrature)
+        return flask.jsonify(result), 400 if 'error' in result else 200
+    if not isinstance(body, list):
+        return flask.jsonify({'error': 'Expected a scenario object or an array of them'}), 400
+    if len(body) > API_MAX_BATCH:
+        return flask.jsonify({'error': f'At most {API_MAX_BATCH} scenarios per request'}), 413
+
+    stream = _flag('stream', False) or (
+        flask.request.accept_mimetypes.best_match(['application/json', NDJSON]) == NDJSON)
+    if not stream:
+        if len(body) > API_MAX_JSON_BATCH:
+            return flask.jsonify({'error': f'At most {API_MAX_JSON_BATCH} scenarios per JSON response; '
+                                           f'ask for {NDJSON} (or ?stream=1) for larger batches'}), 413
+        return flask.jsonify({'results': evaluate(body, profiles=profiles, quadrature=quadrature)})
+
+    def lines():
+        for start in range(0, len(body), API_STREAM_CHUNK):
+            for result in evaluate(body[start:start + API_STREAM_CHUNK], start, profiles, quadrature):
+                yield json.dumps(result) + '\n'
+
+    return flask.Response(lines(), mimetype=NDJSON)
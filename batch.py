@@ -0,0 +1,127 @@
+"""Batch calculation of stress and settlement under point E.
+
+Reads scenarios from a CSV or JSONL file (one scenario per row/line, keyed by
+the Scenario field names or the component ids of the app) and streams one
+result per scenario to a JSONL or CSV file. Only numpy is needed, so this runs
+without dash or plotly installed.
+
+    python batch.py scenarios.csv -o results.jsonl --profiles
+"""
+import argparse
+import contextlib
+import csv
+import json
+import math
+import sys
+
+from calculations import REFERENCE_STEP, Scenario, calculate, calculate_quadrature
+
+SUMMARY_FIELDS = ['id', 'total_settelment_pref', 'total_settelment_ref', 'total_settelment_quad', 'quad_error',
+                  'max_stress_change', 'error']
+
+
+def read_scenarios(stream, fmt):
+    # Yield (id, record, None), or (id, None, error message) for an unreadable line, without loading the whole file
+    if fmt == 'csv':
+        for i, row in enumerate(csv.DictReader(stream)):
+            yield row.pop('id', None) or str(i), row, None
+    else:
+        for i, line in enumerate(stream):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise TypeError('a scenario is a JSON object')
+            except (ValueError, TypeError) as e:
+                yield str(i), None, f'{type(e).__name__}: {e}'
+                continue
+            yield str(record.pop('id', i)), record, None
+
+
+# Numbers of a result that are not finite for some inputs
+TOTAL_FIELDS = ('total_settelment_pref', 'total_settelment_ref', 'total_settelment_quad', 'max_stress_change')
+
+
+def finite_result(result):
+    # result, or an error record if one of its totals is not finite: NaN and Infinity are not JSON
+    if all(math.isfinite(result[field]) for field in TOTAL_FIELDS if field in result):
+        return result
+    return {'id': result['id'], 'error': 'ValueError: The settlement of this scenario is not finite'}
+
+
+def summarize(scenario_id, pref, ref, quadrature=None, profiles=False):
+    """Result record of a scenario from its preferred and reference calculate profiles.
+
+    quadrature is the calculate_quadrature result, if any.
+    """
+    result = {'id': scenario_id}
+    for label, (depths, stress_change, settelment, total_settelment) in (('pref', pref), ('ref', ref)):
+        result[f'total_settelment_{label}'] = round(float(total_settelment), 2)
+        if label == 'ref':
+            result['max_stress_change'] = round(float(stress_change.max()), 2)
+        if profiles:
+            result[f'profile_{label}'] = {
+                'depths': depths.tolist(),
+                'stress_change': stress_change.tolist(),
+                'settelment': settelment.tolist(),
+            }
+    if quadrature is not None:
+        total_settelment, error, _ = quadrature
+        result['total_settelment_quad'] = round(float(total_settelment), 2)
+        result['quad_error'] = float(error)
+    return result
+
+
+def evaluate(scenario_id, record, profiles=False):
+    try:
+        scenario = Scenario.from_record(record)
+        scenario.validate()
+        return finite_result(summarize(scenario_id, calculate(scenario, scenario.sublayer_thickness),
+                                       calculate(scenario, REFERENCE_STEP), calculate_quadrature(scenario), profiles))
+    except (ValueError, TypeError, IndexError, ArithmeticError) as e:
+        return {'id': scenario_id, 'error': f'{type(e).__name__}: {e}'}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stress and settlement under point E for a batch of scenarios.')
+    parser.add_argument('input', help="CSV or JSONL file with one scenario per row ('-' for stdin)")
+    parser.add_argument('-o', '--output', default='-', help="JSONL or CSV result file ('-' for stdout)")
+    parser.add_argument('--input-format', choices=('csv', 'jsonl'), help='default: from the input file extension')
+    parser.add_argument('--output-format', choices=('csv', 'jsonl'), help='default: from the output file extension')
+    parser.add_argument('--profiles', action='store_true', help='include the depth profiles (JSONL output only)')
+    args = parser.parse_args(argv)
+
+    input_format = args.input_format or ('csv' if args.input.endswith('.csv') else 'jsonl')
+    output_format = args.output_format or ('csv' if args.output.endswith('.csv') else 'jsonl')
+    if args.profiles and output_format == 'csv':
+        parser.error('--profiles needs JSONL output')
+
+    failed = 0
+    with contextlib.ExitStack() as stack:
+        source = sys.stdin if args.input == '-' else stack.enter_context(
+            open(args.input, newline='', encoding='utf-8'))
+        sink = sys.stdout if args.output == '-' else stack.enter_context(
+            open(args.output, 'w', newline='', encoding='utf-8'))
+        writer = None
+        if output_format == 'csv':
+            writer = csv.DictWriter(sink, fieldnames=SUMMARY_FIELDS)
+            writer.writeheader()
+        for scenario_id, record, error in read_scenarios(source, input_format):
+            if error:
+                result = {'id': scenario_id, 'error': error}
+            else:
+                result = evaluate(scenario_id, record, profiles=args.profiles)
+            failed += 'error' in result
+            if writer:
+                writer.writerow(result)
+            else:
+                sink.write(json.dumps(result) + '\n')
+
+    if failed:
+        print(f'{failed} scenario(s) failed', file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
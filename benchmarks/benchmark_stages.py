@@ -0,0 +1,218 @@
+"""Benchmarks of the stages of the callbacks of the update button.
+
+Runs every stage over a matrix of footing sizes, total depths and preferred
+sublayer thicknesses and reports latency percentiles, peak traced memory and
+the size of the JSON response:
+
+    influence_grid  contour grid and influence factor kernel
+    settlement      point E profiles for the preferred and the reference sublayers
+    figures         the three go.Figure objects (contour cache warm)
+    serialization   payload compaction and the JSON encoding Dash does
+    update_graphs   all the callbacks of the update button with cold caches
+
+    python benchmarks/benchmark_stages.py --save-baseline benchmarks/baseline.json
+    python benchmarks/benchmark_stages.py --compare benchmarks/baseline.json
+"""
+import argparse
+import dataclasses
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import plotly
+from plotly.io.json import to_json_plotly
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Cold caches include the on-disk result store
+os.environ.setdefault('RESULT_STORE', '0')
+
+import calculations  # noqa: E402
+import stress_in_soils as app  # noqa: E402
+from payload import compact_figures  # noqa: E402
+
+FOOTING_LENGTHS = (1, 4, 10, 25)  # a (m); b = a / 2
+TOTAL_DEPTHS = (1, 12, 30, 60)  # m, split into three equal layers
+SUBLAYER_THICKNESSES = (1, 0.1, 0.01)  # m
+
+QUICK_MATRIX = ((4, 12, 1), (25, 60, 0.1), (1, 60, 0.01))
+
+# A stage is flagged when its median is this much slower than the baseline...
+REGRESSION_THRESHOLD = 0.25
+# ...and slower by at least this many seconds
+REGRESSION_MIN_DELTA = 0.002
+
+
+def scenario_for(a, total_depth, sublayer_thickness):
+    layers = tuple(dataclasses.replace(layer, thickness=total_depth / 3) for layer in calculations.DEFAULT_LAYERS)
+    return calculations.Scenario(sublayer_thickness=sublayer_thickness, water_table=min(1, total_depth),
+                                 a=a, b=a / 2, layers=layers)
+
+
+def state_values(scenario):
+    # Values of the STATE_IDS States of the figure callbacks
+    record = scenario.to_record()
+    return [record[component_id] for component_id in app.STATE_IDS]
+
+
+def clear_caches():
+    app._contour_trace_lru.cache_clear()
+    app._compact_contour_lru.cache_clear()
+    calculations._reference_profile.cache_clear()
+
+
+def stages(scenario):
+    s = scenario
+    total_depth = s.total_depth
+    x0, x1 = 1.5 * s.a, 2.5 * s.a
+    layers = app.soil_layers(s)
+    profiles = app.point_e_profiles(s)
+
+    def influence_grid():
+        if app.CONTOUR_MESH == 'adaptive':
+            x, z = calculations.adaptive_contour_grid(s.a, s.b, total_depth, x0, x1, budget=app.CONTOUR_POINT_BUDGET)
+        else:
+            x, z = calculations.contour_grid(s.a, total_depth, x0, x1)
+        return calculations.influence_factor_grid(x, z, s.a, s.b, x0, x1, symmetric=True)
+
+    def settlement():
+        return [calculations.calculate(s, step) for step in (s.sublayer_thickness, calculations.REFERENCE_STEP)]
+
+    def figures():
+        return [
+            app.foundation_figure(s.a, s.b),
+            app.soil_layers_figure(layers, total_depth, s.water_table, s.a, s.b,
+                                   app.cached_contour_trace(s.a, s.b, total_depth)),
+            app.stress_change_figure(profiles, layers, total_depth),
+        ]
+
+    built = figures()
+
+    def serialization():
+        figs = [fig.to_dict() for fig in built]
+        if app.COMPACT_PAYLOADS:
+            figs, _, _ = compact_figures(*figs)
+        return to_json_plotly(figs)
+
+    def update_graphs():
+        clear_caches()
+        values = state_values(s)
+        return (
+            app.update_foundation(1, None, s.a, s.b),
+            app.update_soil_layers(1, None, None, *values),
+            app.update_stress_change(1, None, None, *values),
+            app.update_section(1, None, *values),
+            app.update_quadrature(1, None, *values),
+        )
+
+    return {
+        'influence_grid': influence_grid,
+        'settlement': settlement,
+        'figures': figures,
+        'serialization': serialization,
+        'update_graphs': update_graphs,
+    }, serialization
+
+
+def measure(stage, repeat):
+    stage()  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    stage()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    p50, p90, p99 = np.percentile(timings, [50, 90, 99])
+    return {'p50': p50, 'p90': p90, 'p99': p99, 'mean': float(np.mean(timings)), 'peak_bytes': peak}
+
+
+def run(matrix, repeat):
+    results = {}
+    for a, total_depth, sublayer_thickness in matrix:
+        if sublayer_thickness > total_depth / 3:
+            continue
+        case = f'a={a} depth={total_depth} step={sublayer_thickness}'
+        clear_caches()
+        stage_functions, serialize = stages(scenario_for(a, total_depth, sublayer_thickness))
+        results[case] = {name: measure(stage, repeat) for name, stage in stage_functions.items()}
+        results[case]['payload_bytes'] = len(serialize().encode('utf-8'))
+        print(format_case(case, results[case]), flush=True)
+    return results
+
+
+def format_case(case, result):
+    lines = [f'{case}  (payload {result["payload_bytes"] / 1024:.0f} KiB)']
+    for name, stats in result.items():
+        if name == 'payload_bytes':
+            continue
+        lines.append(f'  {name:<15} p50 {stats["p50"] * 1e3:8.2f} ms  p90 {stats["p90"] * 1e3:8.2f} ms  '
+                     f'p99 {stats["p99"] * 1e3:8.2f} ms  peak {stats["peak_bytes"] / 2**20:7.2f} MiB')
+    return '\n'.join(lines)
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for case, result in results.items():
+        for name, stats in result.items():
+            reference = baseline.get(case, {}).get(name)
+            if name == 'payload_bytes' or reference is None:
+                continue
+            delta = stats['p50'] - reference['p50']
+            if delta > REGRESSION_MIN_DELTA and stats['p50'] > reference['p50'] * (1 + threshold):
+                regressions.append(f'{case} {name}: p50 {reference["p50"] * 1e3:.2f} ms -> {stats["p50"] * 1e3:.2f} ms')
+        reference_bytes = baseline.get(case, {}).get('payload_bytes')
+        if reference_bytes and result['payload_bytes'] > reference_bytes * (1 + threshold):
+            regressions.append(f'{case} payload: {reference_bytes} -> {result["payload_bytes"]} bytes')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=7, help='timed runs per stage (default 7)')
+    parser.add_argument('--quick', action='store_true', help='run a small subset of the matrix')
+    parser.add_argument('--save-baseline', metavar='PATH', help='write the results as a baseline file')
+    parser.add_argument('--compare', metavar='PATH', help='fail if a stage is slower than in this baseline')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='allowed relative slowdown of the median (default 0.25)')
+    args = parser.parse_args(argv)
+
+    logging.getLogger('payload').setLevel(logging.WARNING)
+    matrix = QUICK_MATRIX if args.quick else itertools.product(FOOTING_LENGTHS, TOTAL_DEPTHS, SUBLAYER_THICKNESSES)
+    results = run(matrix, args.repeat)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'environment': {
+                    'python': platform.python_version(),
+                    'numpy': np.__version__,
+                    'plotly': plotly.__version__,
+                    'machine': platform.platform(),
+                    'contour_mesh': app.CONTOUR_MESH,
+                    'compact_payloads': app.COMPACT_PAYLOADS,
+                },
+                'results': results,
+            }, f, indent=1)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
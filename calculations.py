@@ -0,0 +1,911 @@
+import functools
+import re
+from dataclasses import dataclass, fields, replace
+
+import numpy as np
+
+
+def influence_factor_grid(x, z, a, b, x0, x1, symmetric=False):
+    """Influence factor I on section A-A of an a x b footing spanning x0..x1.
+
+    Each column is the corner superposition of two rectangles (widths a1 and a2,
+    both b/2 wide on either side of the section): 2*I1 + 2*I2 below the footing
+    and 2*I1 - 2*I2 outside of it. The whole grid is evaluated in one pass.
+
+    I is mirror-symmetric about the footing centre. With symmetric=True, columns
+    whose mirror image is also on the x axis are evaluated once and copied.
+    """
+    x = np.asarray(x, dtype=float)
+    z = np.asarray(z, dtype=float)
+
+    if symmetric:
+        distance = np.abs(x - 0.5 * (x0 + x1))
+        # Round away the float noise between a column and its mirror image. Columns on the footing
+        # edges stay apart when that noise puts them on different sides of it, since I jumps there
+        # at shallow depth.
+        outside = (x <= x0) | (x >= x1)
+        key = np.column_stack([np.round(distance / (x1 - x0), 9), outside])
+        _, first, inverse = np.unique(key, axis=0, return_index=True, return_inverse=True)
+        return influence_factor_grid(x[first], z, a, b, x0, x1)[:, inverse.ravel()]
+
+    outside = (x <= x0) | (x >= x1)
+    a1 = np.where(x >= x1, x - x0, x1 - x)[np.newaxis, :]
+    a2 = np.where(x <= x0, x0 - x, x - x1)
+    a2 = np.where(outside, a2, x - x0)[np.newaxis, :]
+    sign = np.where(outside, -1.0, 1.0)[np.newaxis, :]
+
+    Z = z[:, np.newaxis]
+    b1 = b2 = b / 2
+
+    R1 = np.sqrt(a1**2 + b1**2 + Z**2)
+    R2 = np.sqrt(a2**2 + b2**2 + Z**2)
+
+    I1 = (1 / (2 * np.pi)) * (
+        (np.arctan((a1 * b1) / (R1 * Z))) + (((a1 * b1 * Z) / R1) * ((1 / ((a1**2) + (Z**2))) + (1 / ((b1**2) + (Z**2)))))
+    )
+    I2 = (1 / (2 * np.pi)) * (
+        (np.arctan((a2 * b2) / (R2 * Z))) + (((a2 * b2 * Z) / R2) * ((1 / ((a2**2) + (Z**2))) + (1 / ((b2**2) + (Z**2)))))
+    )
+
+    I = 2 * I1 + sign * (2 * I2)
+
+    # Ensure I has no negative values
+    return np.where(I < 0, 0, I)
+
+
+def contour_grid(a, total_depth, x0, x1):
+    """x and z axes of the section A-A contour for a footing spanning x0..x1.
+
+    The grid is fine (0.01*a) under and next to the footing and down to 3*a,
+    and coarse (0.2*a) further out.
+    """
+    x_1 = np.arange(start=x0 - 1.5*a, stop=x0 - 0.5*a, step=0.2*a)
+    x_2 = np.arange(start=x0 - 0.5*a, stop=x1 + 0.5*a, step=0.01*a)
+    x_3 = np.arange(start=x1 + 0.5*a, stop=x1 + 1.5*a, step=0.2*a)
+
+    if total_depth > 3*a:
+        z_1 = np.arange(start=0.000000001, stop=3*a, step=0.01*a)
+        z_2 = np.arange(start=3*a, stop=total_depth, step=0.2*a)
+    else:
+        z_1 = np.arange(start=0.000000001, stop=total_depth, step=0.01*a)
+        z_2 = []
+
+    x = np.concatenate([x_1, x_2, x_3])
+    z = np.concatenate([z_1, z_2])
+    return x, z
+
+
+def _equidistribute(coords, weight, n):
+    # Place n points on coords so that each interval holds the same integral of weight
+    cumulative = np.concatenate([[0], np.cumsum(0.5 * (weight[1:] + weight[:-1]) * np.diff(coords))])
+    return np.interp(np.linspace(0, cumulative[-1], n), cumulative, coords)
+
+
+def adaptive_contour_grid(a, b, total_depth, x0, x1, budget=20000, pilot=(121, 61)):
+    """x and z axes of the section A-A contour, refined where I changes fastest.
+
+    I is sampled on a coarse pilot grid first. Along each axis the points are
+    then spaced so that every interval covers the same arc length of the
+    steepest profile of I, which concentrates them at the footing edges and
+    at shallow depth. The grid covers the same extent as contour_grid, is
+    mirror-symmetric about the footing centre and has at most budget points
+    (but at least 3 x 2).
+    """
+    centre = 0.5 * (x0 + x1)
+    x_min = x0 - 1.5*a
+    # x is mirrored about the centre, so it has an odd number of points; z gets the rest of the budget
+    half = max((int(np.sqrt(budget)) - 1) // 2, 1)
+    nz = max(budget // (2*half + 1), 2)
+
+    # Pilot grid on the left half-plane, geometric in depth to resolve the surface
+    xp = np.linspace(x_min, centre, pilot[0])
+    zp = np.concatenate([[0.000000001], np.geomspace(1e-3 * min(a, b, total_depth), total_depth, pilot[1] - 1)])
+    Ip = influence_factor_grid(xp, zp, a, b, x0, x1)
+
+    # Arc length of I across each axis, scaled by the length of the axis
+    dI_dx = np.abs(np.gradient(Ip, xp, axis=1)).max(axis=0)
+    dI_dz = np.abs(np.gradient(Ip, zp, axis=0)).max(axis=1)
+    weight_x = np.sqrt(1 + ((centre - x_min) * dI_dx)**2)
+    weight_z = np.sqrt(1 + (total_depth * dI_dz)**2)
+
+    left = _equidistribute(xp, weight_x, half + 1)[:-1]
+    x = np.concatenate([left, [centre], (2*centre - left)[::-1]])
+    z = _equidistribute(zp, weight_z, nz)
+    return x, z
+
+GAMMA_WATER = 10  # kN/m³ for water
+
+
+@dataclass(frozen=True)
+class Layer:
+    """One soil layer; unit weights in kN/m³, thickness in m."""
+    thickness: float = 4
+    gamma: float = 18
+    gamma_r: float = 19
+    C_c: float = 0.1
+    C_s: float = 0.05
+    e_0: float = 2
+    OCR: float = 1
+
+
+@dataclass(frozen=True, eq=False)
+class LayerTable:
+    """Per-layer arrays of a soil profile, ordered from the surface down."""
+    thickness: np.ndarray
+    top: np.ndarray
+    bottom: np.ndarray
+    gamma: np.ndarray
+    gamma_r: np.ndarray
+    C_c: np.ndarray
+    C_s: np.ndarray
+    e_0: np.ndarray
+    OCR: np.ndarray
+
+    @classmethod
+    def from_layers(cls, layers):
+        columns = {f.name: np.array([getattr(layer, f.name) for layer in layers], dtype=float) for f in fields(Layer)}
+        bottom = np.cumsum(columns['thickness'])
+        return cls(top=np.concatenate([[0], bottom[:-1]]), bottom=bottom, **columns)
+
+    def index(self, depths):
+        # Binary search on the layer bottoms; a depth on a boundary belongs to the layer above it
+        return np.searchsorted(self.bottom[:-1], depths, side='left')
+
+
+def sublayer_depths(table, step):
+    """Midpoint depths of the sublayers of every layer, deepest first.
+
+    A layer that is not a whole multiple of step gets one extra, shorter
+    sublayer at its bottom.
+    """
+    all_depths = []
+    for k, (top, thickness) in enumerate(zip(table.top, table.thickness)):
+        if k == 0:
+            depths_k = np.arange(start=step / 2, stop=int(thickness / step) * step, step=step)
+            if (thickness / step) % 1 != 0:
+                remaining_thickness = thickness - (depths_k[-1] + step / 2)
+                depths_k = np.append(depths_k, int(thickness / step) * step + remaining_thickness / 2)
+        else:
+            depths_k = np.arange(start=top + step / 2, stop=top + int(thickness / step) * step, step=step)
+            if (thickness / step) % 1 != 0:
+                remaining_thickness = top + thickness - (depths_k[-1] - step / 2)
+                depths_k = np.append(depths_k, depths_k[-1] + remaining_thickness / 2)
+        all_depths.append(depths_k)
+
+    return np.sort(np.concatenate(all_depths))[::-1]
+
+
+def corner_influence(L, B, depths):
+    """Influence factor under the corner of an L x B rectangle.
+
+    The factor is odd in L and in B, so a negative side length subtracts
+    the rectangle; rectangle_influence relies on this.
+    """
+    R = np.sqrt(L**2 + B**2 + depths**2)
+    return (1 / (2 * np.pi)) * (
+        (np.arctan((L * B) / (R * depths))) +
+        (((L * B * depths) / R) * ((1 / ((L**2) + (depths**2))) + (1 / ((B**2) + (depths**2)))))
+    )
+
+
+def point_e_stress_change(depths, a, b, q):
+    # Corner superposition of four a/2 x b/2 rectangles under the centre point E
+    return 4 * corner_influence(a / 2, b / 2, depths) * q
+
+
+def rectangle_influence(dx0, dx1, dy0, dy1, depths):
+    """Influence factor of the rectangle spanning dx0..dx1 x dy0..dy1 relative to the point.
+
+    Signed corner superposition: the four corner rectangles add and subtract
+    to the footing, whether the point is below it or outside of it.
+    """
+    return (corner_influence(dx1, dy1, depths) - corner_influence(dx0, dy1, depths)
+            - corner_influence(dx1, dy0, depths) + corner_influence(dx0, dy0, depths))
+
+
+def initial_effective_stress(depths, table, water_table, gamma_water=GAMMA_WATER):
+    """Initial vertical effective stress sigma_i at the given depths.
+
+    sigma_i is piecewise linear in depth, with breakpoints at the layer tops
+    and at the water table. The stress at each breakpoint is a prefix sum of
+    the unit weight times the interval length above it; gamma is used above
+    the water table and gamma_r - gamma_water below it.
+    """
+    breaks = np.sort(np.append(table.top, water_table))
+    # The interval starting at a breakpoint lies in the layer below it
+    layer = np.searchsorted(table.bottom[:-1], breaks, side='right')
+    unit_weight = np.where(breaks >= water_table, table.gamma_r[layer] - gamma_water, table.gamma[layer])
+
+    sigma_breaks = np.concatenate([[0], np.cumsum(unit_weight[:-1] * np.diff(breaks))])
+
+    j = np.searchsorted(breaks, depths, side='right') - 1
+    return sigma_breaks[j] + unit_weight[j] * (depths - breaks[j])
+
+
+def compression_settlement(sigma_i, stress_change, thickness, C_c, C_s, e_0, OCR):
+    """Settlement (mm) of sublayers of the given thickness (m).
+
+    Normally consolidated sublayers (OCR == 1) compress along C_c. For OCR > 1
+    the sublayer recompresses along C_s while sigma_f <= sigma_p, and along
+    C_s then C_c once sigma_f crosses the preconsolidation stress sigma_p.
+    """
+    sigma_f = sigma_i + stress_change
+    sigma_p = OCR * sigma_i
+    factor = 1000 * (thickness / (1 + e_0))
+
+    normally_consolidated = factor * C_c * np.log10(sigma_f / sigma_i)
+    recompression = factor * C_s * np.log10(sigma_f / sigma_i)
+    crossing = factor * (
+        (C_s * np.log10(sigma_p / sigma_i)) +
+        (C_c * np.log10(sigma_f / sigma_p))
+    )
+    return np.where(OCR == 1, normally_consolidated, np.where(sigma_f <= sigma_p, recompression, crossing))
+
+
+def settlement_profile(step, table, water_table, a, b, q):
+    """Stress increment and settlement under point E for sublayers of thickness step.
+
+    Returns depths (deepest first), the stress change, the settlement
+    accumulated from the bottom up to each depth, and the total settlement.
+    """
+    depths = sublayer_depths(table, step)
+    stress_change = point_e_stress_change(depths, a, b, q)
+
+    sigma_i = initial_effective_stress(depths, table, water_table)
+    layer = table.index(depths)
+    delta_settlement = compression_settlement(
+        sigma_i, stress_change, step,
+        table.C_c[layer], table.C_s[layer], table.e_0[layer], table.OCR[layer],
+    )
+
+    settelment = np.cumsum(delta_settlement)
+    total_settelment = settelment[-1]
+    return depths, stress_change, settelment, total_settelment
+
+
+def section_settlement(step, table, water_table, a, b, q, x, x0, x1):
+    """Total settlement (mm) along section A-A of an a x b footing spanning x0..x1.
+
+    Each x column is the point E calculation of settlement_profile with the
+    stress change of rectangle_influence at that point of the section; sigma_i
+    and the layer of each sublayer are shared, and all columns are evaluated
+    in one (sublayers, columns) pass.
+    """
+    depths = sublayer_depths(table, step)
+    x = np.asarray(x, dtype=float)
+    stress_change = q * rectangle_influence(x0 - x, x1 - x, -b / 2, b / 2, depths[:, np.newaxis])
+
+    sigma_i = initial_effective_stress(depths, table, water_table)
+    layer = table.index(depths)
+    delta_settlement = compression_settlement(
+        sigma_i[:, np.newaxis], stress_change, step,
+        *(getattr(table, name)[layer][:, np.newaxis] for name in ('C_c', 'C_s', 'e_0', 'OCR')),
+    )
+    return delta_settlement.sum(axis=0)
+
+
+def distortion(x, settlement, x0, x1):
+    """Largest differential settlement (mm) below the footing x0..x1 and the angular distortion.
+
+    The angular distortion is the steepest slope of the settlement profile
+    between neighbouring points of the section (mm settlement per mm).
+    """
+    below = (x >= x0) & (x <= x1)
+    differential = np.ptp(settlement[below]) if below.any() else 0.0
+    slope = np.abs(np.diff(settlement) / (1000 * np.diff(x)))
+    return differential, slope.max(initial=0.0)
+
+
+QUADRATURE_TOLERANCE = 1e-3  # mm of total settlement
+QUADRATURE_MAX_LEVELS = 30
+# Intervals one adaptive integration may evaluate; a strain that never converges stops here
+QUADRATURE_MAX_INTERVALS = 10_000
+
+# 15-point Kronrod extension of the 7-point Gauss-Legendre rule (QUADPACK qk15), nodes in -1..1
+_KRONROD_NODES = np.array([
+    0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+    0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+    0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+    0.207784955007898467600689403773245, 0.0,
+])
+_KRONROD_WEIGHTS = np.array([
+    0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+    0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+    0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+    0.204432940075298892414161999234649, 0.209482141084727828012999174891714,
+])
+# Gauss weights of the odd Kronrod nodes
+_GAUSS_WEIGHTS = np.array([
+    0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+    0.381830050505118944950369775488975, 0.417959183673469387755102040816327,
+])
+_NODES = np.concatenate([-_KRONROD_NODES[:-1], _KRONROD_NODES[::-1]])
+_WEIGHTS_K15 = np.concatenate([_KRONROD_WEIGHTS[:-1], _KRONROD_WEIGHTS[::-1]])
+_WEIGHTS_G7 = np.zeros(15)
+_WEIGHTS_G7[1:7:2] = _GAUSS_WEIGHTS[:-1]
+_WEIGHTS_G7[7] = _GAUSS_WEIGHTS[-1]
+_WEIGHTS_G7[9:15:2] = _GAUSS_WEIGHTS[-2::-1]
+
+
+def _find_crossing(g, lo, hi, iterations=60):
+    # Root of g between lo and hi, where g changes sign, by regula falsi with the Illinois modification
+    # after one vectorized scan; the scan is geometric near the surface, where g varies fastest
+    scan = np.geomspace(lo, hi, 8) if lo < 1e-3 * hi else np.linspace(lo, hi, 8)
+    values = g(scan)
+    evaluations = scan.size
+    changes = np.flatnonzero(np.sign(values[:-1]) * np.sign(values[1:]) <= 0)
+    if not np.isfinite(values).all() or changes.size == 0:
+        return np.nan, evaluations
+    i = changes[0]
+    lo, hi, g_lo, g_hi = scan[i], scan[i + 1], values[i], values[i + 1]
+    z = lo
+    side = 0
+    for _ in range(iterations):
+        previous, z = z, (lo * g_hi - hi * g_lo) / (g_hi - g_lo)
+        g_z = g(z)
+        evaluations += 1
+        if g_z == 0 or abs(z - previous) < 1e-10 * max(1, z):
+            break
+        if np.sign(g_z) == np.sign(g_hi):
+            hi, g_hi = z, g_z
+            if side == -1:
+                g_lo /= 2
+            side = -1
+        else:
+            lo, g_lo = z, g_z
+            if side == 1:
+                g_hi /= 2
+            side = 1
+    return z, evaluations
+
+
+def _adaptive_gauss_kronrod(f, lo, hi, tolerance):
+    """Integral of f over lo..hi by the Gauss-Kronrod 7-15 rule on bisected intervals.
+
+    The difference between the 15-point Kronrod and the embedded 7-point
+    Gauss-Legendre result estimates the error of an interval; intervals over
+    their share of tolerance are bisected, and every pending interval of a
+    level is evaluated in one call of f. Returns the integral, the summed
+    error estimates and the number of evaluations of f.
+    """
+    left, right = np.array([lo]), np.array([hi])
+    integral = error = 0.0
+    evaluations = intervals = 0
+    for level in range(QUADRATURE_MAX_LEVELS):
+        half = (right - left) / 2
+        values = f((left + right)[:, np.newaxis] / 2 + half[:, np.newaxis] * _NODES)
+        evaluations += values.size
+        intervals += left.size
+        if not np.isfinite(values).all():
+            # No amount of bisection converges on NaN or infinite values
+            return np.nan, np.nan, evaluations
+        kronrod = values @ _WEIGHTS_K15 * half
+        difference = np.abs(kronrod - values @ _WEIGHTS_G7 * half)
+        done = difference <= tolerance * (right - left) / (hi - lo)
+        if level == QUADRATURE_MAX_LEVELS - 1 or intervals + 2 * np.count_nonzero(~done) > QUADRATURE_MAX_INTERVALS:
+            done[:] = True
+        integral += kronrod[done].sum()
+        error += difference[done].sum()
+        if done.all():
+            break
+        mid = (left + right)[~done] / 2
+        left, right = np.concatenate([left[~done], mid]), np.concatenate([mid, right[~done]])
+    return integral, error, evaluations
+
+
+def quadrature_settlement(table, water_table, a, b, q, tolerance=QUADRATURE_TOLERANCE):
+    """Total settlement (mm) under point E as the integral of the strain over depth.
+
+    The depth is split at the layer boundaries, at the water table and, in
+    overconsolidated layers, at the depth where sigma_f crosses sigma_p, so
+    the strain is smooth on every piece. Each piece is integrated with
+    adaptive Gauss-Kronrod rules. sigma_i vanishes at the surface, which
+    makes the strain log-singular there; the top piece is integrated in s
+    with z = top + length * s^3 to smooth it out.
+
+    Returns the settlement, an error estimate (mm) and the number of strain
+    evaluations.
+    """
+    total_depth = table.bottom[-1]
+    evaluations = 0
+
+    def strain(z, k):
+        # Settlement per metre of depth (mm/m) in layer k
+        sigma_i = initial_effective_stress(z, table, water_table)
+        return compression_settlement(sigma_i, point_e_stress_change(z, a, b, q), 1,
+                                      table.C_c[k], table.C_s[k], table.e_0[k], table.OCR[k])
+
+    pieces = []
+    for k in np.flatnonzero(table.thickness > 0):
+        breaks = [table.top[k], table.bottom[k]]
+        if table.top[k] < water_table < table.bottom[k]:
+            breaks.insert(1, water_table)
+        if table.OCR[k] != 1:
+            def excess(z, k=k):
+                # sigma_f - sigma_p; it falls with depth, so it changes sign at most once per piece
+                return point_e_stress_change(z, a, b, q) - (table.OCR[k] - 1) * initial_effective_stress(z, table, water_table)
+            for lo, hi in zip(breaks[:-1], breaks[1:]):
+                # sigma_i vanishes at the surface, so start just below it
+                lo = max(lo, 1e-9 * hi)
+                if np.sign(excess(lo)) * np.sign(excess(hi)) < 0:
+                    crossing, used = _find_crossing(excess, lo, hi)
+                    evaluations += used
+                    if np.isnan(crossing):
+                        return np.nan, np.nan, evaluations
+                    breaks.append(crossing)
+        breaks = sorted(breaks)
+        pieces += [(lo, hi, k) for lo, hi in zip(breaks[:-1], breaks[1:]) if hi > lo]
+
+    settlement = error = 0.0
+    for lo, hi, k in pieces:
+        share = tolerance * (hi - lo) / total_depth
+        if lo == 0:
+            def f(s, hi=hi, k=k):
+                return strain(hi * s**3, k) * 3 * hi * s**2
+            result = _adaptive_gauss_kronrod(f, 0.0, 1.0, share)
+        else:
+            result = _adaptive_gauss_kronrod(lambda z, k=k: strain(z, k), lo, hi, share)
+        settlement += result[0]
+        error += result[1]
+        evaluations += result[2]
+    return settlement, error, evaluations
+
+
+REFERENCE_STEP = 0.05  # sublayer thickness (m) of the reference settlement profile
+REFERENCE_CACHE_SIZE = 32
+
+DEFAULT_LAYERS = (
+    Layer(thickness=4, gamma=18, gamma_r=19),
+    Layer(thickness=4, gamma=19, gamma_r=21),
+    Layer(thickness=4, gamma=18, gamma_r=19),
+)
+
+# Component ids of the Dash controls whose names differ from the Scenario fields
+COMPONENT_IDS = {
+    'input-factor': 'sublayer_thickness',
+    'water-table': 'water_table',
+}
+
+# Component id prefixes of the per-layer controls (z-1, gamma_1, gamma_r_1, ...)
+LAYER_PREFIXES = {
+    'z-': 'thickness',
+    'gamma_': 'gamma',
+    'gamma_r_': 'gamma_r',
+    'C_c_': 'C_c',
+    'C_s_': 'C_s',
+    'e_0_': 'e_0',
+    'OCR_': 'OCR',
+}
+def default_layers(count):
+    """Default properties of count layers; layers beyond the third start with zero thickness."""
+    return DEFAULT_LAYERS[:count] + (Layer(thickness=0),) * max(0, count - len(DEFAULT_LAYERS))
+
+
+def _number(value):
+    # Numbers pass through, so 4 stays an int in the labels of the figures
+    return value if isinstance(value, (int, float)) else float(value)
+
+
+# Most layers of a Scenario; every layer costs engine work, so records may not ask for more
+MAX_LAYERS = 50
+
+_LAYER_KEY = re.compile(r'^(z-|z_?|gamma_r_|gamma_|C_c_|C_s_|e_0_|OCR_)([1-9][0-9]*)$')
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """Inputs of one calculation, mirroring the States of the main figure callbacks."""
+    sublayer_thickness: float = 1
+    water_table: float = 1
+    a: float = 4
+    b: float = 2
+    q: float = 100
+    layers: tuple = DEFAULT_LAYERS
+
+    @classmethod
+    def from_record(cls, record, layer_count=None):
+        """Build a Scenario from a dict keyed by field names or component ids.
+
+        Layer properties use the component ids (z-1, gamma_r_2, OCR_3, ...);
+        z1 and z_1 are accepted for the thicknesses. layer_count defaults to
+        the highest layer number in the record, and at least three; more than
+        MAX_LAYERS layers is a ValueError. Values may be strings (e.g. from a
+        CSV row); empty values and missing keys fall back to default_layers
+        and the defaults of the app.
+        """
+        names = {f.name for f in fields(cls)} - {'layers'}
+        values = {}
+        layer_values = {}
+        for key, value in record.items():
+            match = _LAYER_KEY.match(key)
+            name = COMPONENT_IDS.get(key, key)
+            if match is None and name not in names:
+                raise ValueError(f'Unknown scenario parameter: {key}')
+            if value is None or value == '':
+                continue
+            if match:
+                prefix = 'z-' if match.group(1).startswith('z') else match.group(1)
+                layer_values.setdefault(int(match.group(2)), {})[LAYER_PREFIXES[prefix]] = _number(value)
+            else:
+                values[name] = _number(value)
+
+        if layer_count is None:
+            layer_count = max([len(DEFAULT_LAYERS), *layer_values])
+        if layer_count > MAX_LAYERS:
+            raise ValueError(f'At most {MAX_LAYERS} layers')
+        layers = tuple(replace(layer, **layer_values.get(i, {}))
+                       for i, layer in enumerate(default_layers(layer_count), start=1))
+        return cls(layers=layers, **values)
+
+    def to_record(self):
+        # Inverse of from_record, keyed by component ids
+        record = {'input-factor': self.sublayer_thickness, 'water-table': self.water_table,
+                  'a': self.a, 'b': self.b, 'q': self.q}
+        for i, layer in enumerate(self.layers, start=1):
+            for prefix, name in LAYER_PREFIXES.items():
+                record[f'{prefix}{i}'] = getattr(layer, name)
+        return record
+
+    @property
+    def thicknesses(self):
+        return tuple(layer.thickness for layer in self.layers)
+
+    @property
+    def total_depth(self):
+        return sum(self.thicknesses)
+
+    def layer_table(self):
+        return LayerTable.from_layers(self.layers)
+
+    def validate(self):
+        """Raise a ValueError if the calculations of this Scenario would fail or not be finite.
+
+        Every layer must also be at least one REFERENCE_STEP sublayer thick,
+        since the reference profile is part of every result.
+        """
+        values = [self.sublayer_thickness, self.water_table, self.a, self.b, self.q]
+        values += [getattr(layer, f.name) for layer in self.layers for f in fields(Layer)]
+        if not np.isfinite(np.array(values, dtype=float)).all():
+            raise ValueError('Every value must be a finite number')
+        if self.sublayer_thickness <= 0:
+            raise ValueError('input-factor must be positive')
+        if any(thickness < 0 for thickness in self.thicknesses) or self.total_depth <= 0:
+            raise ValueError('Layer thicknesses must not be negative, and not all zero')
+        if any(0 < thickness < max(self.sublayer_thickness, REFERENCE_STEP) for thickness in self.thicknesses):
+            raise ValueError(f'Every layer must be at least one sublayer and {REFERENCE_STEP} m thick')
+        if self.a <= 0 or self.b <= 0:
+            raise ValueError('The footing sides a and b must be positive')
+        for i, layer in enumerate(self.layers, start=1):
+            if layer.gamma <= 0 or layer.gamma_r <= 0:
+                raise ValueError(f'The unit weights of layer {i} must be positive')
+            if layer.e_0 <= -1:
+                raise ValueError(f'The void ratio e_0_{i} must be greater than -1')
+            if layer.OCR < 1:
+                raise ValueError(f'The overconsolidation ratio OCR_{i} must be at least 1')
+
+
+def calculate(scenario, step):
+    """Point E profile of a Scenario for sublayers of thickness step (see settlement_profile)."""
+    s = scenario
+    return settlement_profile(step, s.layer_table(), s.water_table, s.a, s.b, s.q)
+
+
+def calculate_quadrature(scenario, tolerance=QUADRATURE_TOLERANCE):
+    """quadrature_settlement of a Scenario: (settlement, error estimate, evaluations)."""
+    s = scenario
+    return quadrature_settlement(s.layer_table(), s.water_table, s.a, s.b, s.q, tolerance)
+
+
+def calculate_section(scenario, step, x, x0, x1):
+    """section_settlement of a Scenario along the section points x."""
+    s = scenario
+    return section_settlement(step, s.layer_table(), s.water_table, s.a, s.b, s.q, x, x0, x1)
+
+
+@functools.lru_cache(maxsize=REFERENCE_CACHE_SIZE)
+def _reference_profile(scenario):
+    profile = calculate(scenario, REFERENCE_STEP)
+    # The cached arrays are shared between callers
+    for array in profile[:3]:
+        array.setflags(write=False)
+    return profile
+
+
+def reference_profile(scenario):
+    """calculate(scenario, REFERENCE_STEP), memoized on every input except the preferred sublayer thickness."""
+    return _reference_profile(replace(scenario, sublayer_thickness=REFERENCE_STEP))
+
+
+# Hits and misses of the reference profile cache
+reference_cache_info = _reference_profile.cache_info
+
+
+# Elements (combinations x sublayers x layers) evaluated at once by sweep_settlement
+SWEEP_CHUNK_SIZE = 2_000_000
+
+
+def initial_effective_stress_broadcast(depths, top, bottom, gamma, gamma_r, water_table, gamma_water=GAMMA_WATER):
+    """initial_effective_stress for many soil profiles at once.
+
+    The layers are on the last axis of top, bottom, gamma and gamma_r, and the
+    remaining axes broadcast against depths and water_table. Each layer adds
+    gamma times its overlap with the dry interval 0..water_table above the
+    depth, and gamma_r - gamma_water times its overlap with the submerged
+    interval below the water table.
+    """
+    z = np.asarray(depths, dtype=float)[..., np.newaxis]
+    water_table = np.asarray(water_table, dtype=float)[..., np.newaxis]
+    dry = np.clip(np.minimum(np.minimum(z, water_table), bottom) - top, 0, None)
+    submerged = np.clip(np.minimum(z, bottom) - np.maximum(water_table, top), 0, None)
+    return np.sum(gamma * dry + (gamma_r - gamma_water) * submerged, axis=-1)
+
+
+def parse_parameter(name):
+    """('scenario', field) or ('layer', attribute, index) of an input name or component id."""
+    match = _LAYER_KEY.match(name)
+    if match:
+        prefix = 'z-' if match.group(1).startswith('z') else match.group(1)
+        return 'layer', LAYER_PREFIXES[prefix], int(match.group(2)) - 1
+    name = COMPONENT_IDS.get(name, name)
+    if name not in {f.name for f in fields(Scenario)} - {'layers'}:
+        raise ValueError(f'Unknown scenario parameter: {name}')
+    return 'scenario', name
+
+
+def sweep_settlement(scenario, x_name, x_values, y_name, y_values, step=None, chunk_size=SWEEP_CHUNK_SIZE,
+                     progress=None):
+    """Total settlement under point E for every combination of two swept inputs.
+
+    x_name and y_name are Scenario fields or layer component ids (a, q,
+    water-table, OCR_1, C_c_2, ...); all other inputs come from scenario.
+    Layer thicknesses and the sublayer thickness fix the sublayer depths, so
+    they cannot be swept. Every combination is evaluated in one broadcast
+    pass over (combinations, sublayers), chunk_size elements at a time;
+    progress, if given, is called with the fraction done after each chunk.
+
+    Returns an array of shape (len(y_values), len(x_values)).
+    """
+    step = scenario.sublayer_thickness if step is None else step
+    swept = [parse_parameter(x_name), parse_parameter(y_name)]
+    if swept[0] == swept[1]:
+        raise ValueError('The two swept parameters must differ')
+    for parameter in swept:
+        if parameter[1] in ('sublayer_thickness', 'thickness'):
+            raise ValueError('Thicknesses fix the sublayer depths and cannot be swept')
+        if parameter[0] == 'layer' and not 0 <= parameter[2] < len(scenario.layers):
+            raise ValueError(f'Scenario has no layer {parameter[2] + 1}')
+
+    table = scenario.layer_table()
+    depths = sublayer_depths(table, step)
+    layer = table.index(depths)
+    x_grid, y_grid = np.meshgrid(np.asarray(x_values, dtype=float), np.asarray(y_values, dtype=float))
+    combinations = np.column_stack([x_grid.ravel(), y_grid.ravel()])
+
+    total = np.empty(len(combinations))
+    chunk = max(1, chunk_size // (depths.size * len(table.thickness)))
+    for start in range(0, len(combinations), chunk):
+        values = combinations[start:start + chunk]
+        inputs = {name: getattr(scenario, name) for name in ('a', 'b', 'q', 'water_table')}
+        layers = {name: getattr(table, name) for name in ('gamma', 'gamma_r', 'C_c', 'C_s', 'e_0', 'OCR')}
+        for parameter, column in zip(swept, values.T):
+            if parameter[0] == 'scenario':
+                inputs[parameter[1]] = column[:, np.newaxis]
+            else:
+                _, name, index = parameter
+                layers[name] = np.repeat(layers[name][np.newaxis, :], len(values), axis=0)
+                layers[name][:, index] = column
+        # Unswept layer properties stay 1-d and broadcast over the combinations
+        unit_weights = [array if array.ndim == 1 else array[:, np.newaxis, :]
+                        for array in (layers['gamma'], layers['gamma_r'])]
+
+        stress_change = point_e_stress_change(depths, inputs['a'], inputs['b'], inputs['q'])
+        sigma_i = initial_effective_stress_broadcast(depths, table.top, table.bottom, *unit_weights, inputs['water_table'])
+        delta_settlement = compression_settlement(
+            sigma_i, stress_change, step,
+            *(layers[name][..., layer] for name in ('C_c', 'C_s', 'e_0', 'OCR')),
+        )
+        total[start:start + chunk] = np.broadcast_to(delta_settlement, (len(values), depths.size)).sum(axis=-1)
+        if progress:
+            progress((start + len(values)) / len(combinations))
+
+    return total.reshape(x_grid.shape)
+
+
+# Elements (scenarios x sublayers x layers) evaluated at once by batch_profiles
+BATCH_CHUNK_SIZE = 2_000_000
+
+
+def batch_profiles(scenarios, step=None, chunk_size=BATCH_CHUNK_SIZE):
+    """calculate for many scenarios, in broadcast passes over (scenarios, sublayers).
+
+    step defaults to the sublayer thickness of each scenario. Scenarios with
+    the same sublayer thickness and layer thicknesses share their sublayer
+    depths, and each such group is evaluated like sweep_settlement, chunk_size
+    elements at a time, with the footing, the water table and the layer
+    properties varying between rows. Returns one (depths, stress_change,
+    settelment, total_settelment) tuple per scenario, in order, equal to
+    calculate(scenario, step).
+    """
+    scenarios = list(scenarios)
+    groups = {}
+    for i, scenario in enumerate(scenarios):
+        s_step = scenario.sublayer_thickness if step is None else step
+        groups.setdefault((s_step, scenario.thicknesses), []).append(i)
+
+    results = [None] * len(scenarios)
+    for (s_step, _), members in groups.items():
+        table = scenarios[members[0]].layer_table()
+        depths = sublayer_depths(table, s_step)
+        layer = table.index(depths)
+        chunk = max(1, chunk_size // (depths.size * len(table.thickness)))
+        for start in range(0, len(members), chunk):
+            rows = [scenarios[i] for i in members[start:start + chunk]]
+
+            def column(name):
+                return np.array([getattr(s, name) for s in rows], dtype=float)[:, np.newaxis]
+
+            def layer_array(name):
+                return np.array([[getattr(l, name) for l in s.layers] for s in rows], dtype=float)
+
+            stress_change = point_e_stress_change(depths, column('a'), column('b'), column('q'))
+            sigma_i = initial_effective_stress_broadcast(
+                depths, table.top, table.bottom, layer_array('gamma')[:, np.newaxis, :],
+                layer_array('gamma_r')[:, np.newaxis, :], column('water_table'))
+            delta_settlement = compression_settlement(
+                sigma_i, stress_change, s_step,
+                *(layer_array(name)[:, layer] for name in ('C_c', 'C_s', 'e_0', 'OCR')),
+            )
+            settelment = np.cumsum(delta_settlement, axis=1)
+            for i, k in zip(members[start:start + chunk], range(len(rows))):
+                results[i] = (depths, stress_change[k], settelment[k], settelment[k, -1])
+    return results
+
+
+# Layer properties monte_carlo_settlement can draw; they do not change the stresses
+UNCERTAIN_PROPERTIES = ('C_c', 'C_s', 'e_0', 'OCR')
+# Realizations x layers drawn at once by monte_carlo_settlement
+MONTE_CARLO_CHUNK_SIZE = 1_000_000
+
+
+def _draw(rng, mean, cov, size, distribution):
+    # Realizations of a positive property with the given mean and coefficient of variation
+    if distribution == 'lognormal':
+        sigma = np.sqrt(np.log1p(cov**2))
+        return rng.lognormal(np.log(mean) - sigma**2 / 2, sigma, size)
+    if distribution == 'normal':
+        return np.clip(rng.normal(mean, cov * np.abs(mean), size), np.finfo(float).tiny, None)
+    raise ValueError(f'Unknown distribution: {distribution}')
+
+
+def monte_carlo_settlement(scenario, cov, realizations=10_000, step=None, distribution='lognormal', seed=None,
+                           chunk_size=MONTE_CARLO_CHUNK_SIZE, progress=None):
+    """Total settlement under point E for random realizations of the layer properties.
+
+    cov maps a property (C_c, C_s, e_0, OCR) or a property of one layer (C_c_1,
+    OCR_2, ...) to its coefficient of variation. Every property of every layer
+    is drawn independently around its scenario value, as its mean, from a
+    lognormal or a normal distribution; OCR is clipped to at least 1.
+
+    The stress profile and sigma_i do not depend on these properties, so the
+    per-sublayer log10(sigma_f / sigma_i) is computed once and sorted per
+    layer. A realization then needs, per layer, only the prefix sums of those
+    logs below and above log10(OCR), found by binary search, which is the
+    settlement formula of compression_settlement summed over the sublayers.
+
+    Returns an array of realizations total settlements (mm). progress, if
+    given, is called with the fraction done after each chunk of realizations.
+    """
+    step = scenario.sublayer_thickness if step is None else step
+    table = scenario.layer_table()
+    count = len(table.thickness)
+    spread = {name: np.zeros(count) for name in UNCERTAIN_PROPERTIES}
+    for key, value in cov.items():
+        if key in spread:
+            spread[key][:] = value
+            continue
+        kind, *parameter = parse_parameter(key)
+        if kind != 'layer' or parameter[0] not in spread or not 0 <= parameter[1] < count:
+            raise ValueError(f'Cannot draw {key}')
+        spread[parameter[0]][parameter[1]] = value
+
+    depths = sublayer_depths(table, step)
+    stress_change = point_e_stress_change(depths, scenario.a, scenario.b, scenario.q)
+    sigma_i = initial_effective_stress(depths, table, scenario.water_table)
+    log_ratio = np.log10((sigma_i + stress_change) / sigma_i)
+    layer = table.index(depths)
+
+    # Per layer: sorted logs and their prefix sums, padded to the largest sublayer count
+    sizes = np.bincount(layer, minlength=count)
+    sorted_logs = np.full((count, sizes.max(initial=0)), np.inf)
+    prefix = np.zeros((count, sorted_logs.shape[1] + 1))
+    for k in range(count):
+        logs = np.sort(log_ratio[layer == k])
+        sorted_logs[k, :logs.size] = logs
+        prefix[k, 1:logs.size + 1] = np.cumsum(logs)
+        prefix[k, logs.size + 1:] = prefix[k, logs.size]
+    layer_totals = prefix[np.arange(count), sizes]
+
+    rng = np.random.default_rng(seed)
+    total = np.empty(realizations)
+    chunk = max(1, chunk_size // count)
+    for start in range(0, realizations, chunk):
+        size = (min(chunk, realizations - start), count)
+        drawn = {}
+        for name in UNCERTAIN_PROPERTIES:
+            mean = getattr(table, name)
+            drawn[name] = np.where(spread[name] > 0, _draw(rng, mean, spread[name], size, distribution), mean)
+        OCR = np.maximum(drawn['OCR'], 1)
+        log_OCR = np.log10(OCR)
+
+        # Sublayers with log_ratio <= log10(OCR) stay on the recompression line
+        below = np.stack([np.searchsorted(sorted_logs[k], log_OCR[:, k], side='right') for k in range(count)], axis=1)
+        sum_below = np.take_along_axis(prefix, below.T, axis=1).T
+        above = sizes - below
+        recompression = drawn['C_s'] * (sum_below + log_OCR * above)
+        virgin = drawn['C_c'] * (layer_totals - sum_below - log_OCR * above)
+        settlement = np.where(OCR == 1, drawn['C_c'] * layer_totals, recompression + virgin)
+        total[start:start + size[0]] = np.sum(1000 * (step / (1 + drawn['e_0'])) * settlement, axis=1)
+        if progress:
+            progress((start + size[0]) / realizations)
+    return total
+
+
+# Stress increments (kPa) below this are left out of footing group superpositions
+STRESS_TOLERANCE = 0.1
+
+
+@dataclass(frozen=True)
+class Footing:
+    """Rectangular footing of a x b (m, along x and y) centred at (x, y), loaded with q (kPa)."""
+    x: float = 0
+    y: float = 0
+    a: float = 4
+    b: float = 2
+    q: float = 100
+
+    def point_load_bound(self, distance, depths):
+        # Every element dA of the footing adds at most 3 q dA z^3 / (2 pi r^5) (a Boussinesq
+        # point load), with r no less than the distance to the nearest point of the footing
+        return 3 * abs(self.q) * self.a * self.b * depths**3 / (2 * np.pi * distance**5)
+
+    def cutoff_radius(self, tolerance=STRESS_TOLERANCE):
+        # Horizontal distance beyond which point_load_bound < tolerance at every depth;
+        # z^3 / r^5 peaks at z = sqrt(3/2) times the horizontal distance
+        peak = 1.5**1.5 / 2.5**2.5
+        return np.sqrt(3 * abs(self.q) * self.a * self.b * peak / (2 * np.pi * tolerance))
+
+
+def group_stress_change(footings, x, y, depths, tolerance=STRESS_TOLERANCE):
+    """Vertical stress increase at the points (x, y, depths) below a group of footings.
+
+    The footings are superposed with rectangle_influence. A footing is skipped
+    at the points where its point_load_bound is below tolerance. The points
+    are sorted on x once, so the points within the cutoff radius of a footing
+    are found by binary search and the cost grows with the number of points
+    near each footing rather than with footings x points.
+
+    x, y and depths broadcast against each other; the result has their shape.
+    """
+    x, y, depths = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (x, y, depths)))
+    shape = x.shape
+    x, y, depths = x.ravel(), y.ravel(), depths.ravel()
+    order = np.argsort(x, kind='stable')
+    sorted_x = x[order]
+
+    stress = np.zeros(x.size)
+    for footing in footings:
+        x0, x1 = footing.x - footing.a / 2, footing.x + footing.a / 2
+        y0, y1 = footing.y - footing.b / 2, footing.y + footing.b / 2
+        radius = footing.cutoff_radius(tolerance)
+        start = np.searchsorted(sorted_x, x0 - radius, side='left')
+        stop = np.searchsorted(sorted_x, x1 + radius, side='right')
+        candidates = order[start:stop]
+
+        # Distance from each candidate to the nearest point of the footing
+        dx = np.maximum(np.maximum(x0 - x[candidates], x[candidates] - x1), 0)
+        dy = np.maximum(np.maximum(y0 - y[candidates], y[candidates] - y1), 0)
+        distance = np.sqrt(dx**2 + dy**2 + depths[candidates]**2)
+        near = candidates[footing.point_load_bound(distance, depths[candidates]) >= tolerance]
+        stress[near] += footing.q * rectangle_influence(
+            x0 - x[near], x1 - x[near], y0 - y[near], y1 - y[near], depths[near])
+    return stress.reshape(shape)
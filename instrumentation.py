@@ -0,0 +1,143 @@
+"""Per-stage timing of the server callbacks.
+
+CallbackTimer times the stages of one callback call. Every finished call is
+added to the in-process metrics (counters and latency histograms, exposed in
+the Prometheus text format by render_metrics) and, when TIMING_LOG is set,
+appended to that file as one JSON line.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# JSONL file the stage timings are appended to (disabled when unset)
+TIMING_LOG = os.environ.get('TIMING_LOG')
+
+# Upper bounds (s) of the latency histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+PREFIX = 'stress_in_soils'
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.caches = {}
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, seconds, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self.histograms.setdefault(key, {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+    def register_cache(self, name, cache_info):
+        # cache_info is a functools.lru_cache cache_info function
+        self.caches[name] = cache_info
+
+
+metrics = Metrics()
+
+
+def _labels(labels):
+    return ','.join(f'{k}="{v}"' for k, v in labels)
+
+
+def render_metrics():
+    # Prometheus text exposition of the metrics of this worker process
+    lines = []
+    with metrics._lock:
+        counters = dict(metrics.counters)
+        histograms = {k: dict(v, buckets=list(v['buckets'])) for k, v in metrics.histograms.items()}
+
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f'# TYPE {PREFIX}_{name} counter')
+        for (counter, labels), value in sorted(counters.items()):
+            if counter == name:
+                lines.append(f'{PREFIX}_{name}{{{_labels(labels)}}} {value}')
+
+    lines.append(f'# HELP {PREFIX}_stage_seconds Duration of each callback stage')
+    lines.append(f'# TYPE {PREFIX}_stage_seconds histogram')
+    for labels, histogram in sorted(histograms.items()):
+        for bound, count in zip(BUCKETS, histogram['buckets']):
+            lines.append(f'{PREFIX}_stage_seconds_bucket{{{_labels(labels + (("le", bound),))}}} {count}')
+        lines.append(f'{PREFIX}_stage_seconds_bucket{{{_labels(labels + (("le", "+Inf"),))}}} {histogram["count"]}')
+        lines.append(f'{PREFIX}_stage_seconds_sum{{{_labels(labels)}}} {histogram["sum"]}')
+        lines.append(f'{PREFIX}_stage_seconds_count{{{_labels(labels)}}} {histogram["count"]}')
+
+    for kind in ('hits', 'misses'):
+        lines.append(f'# TYPE {PREFIX}_cache_{kind}_total counter')
+        for name, cache_info in sorted(metrics.caches.items()):
+            lines.append(f'{PREFIX}_cache_{kind}_total{{cache="{name}"}} {getattr(cache_info(), kind)}')
+    lines.append(f'# TYPE {PREFIX}_cache_hit_ratio gauge')
+    for name, cache_info in sorted(metrics.caches.items()):
+        info = cache_info()
+        lookups = info.hits + info.misses
+        lines.append(f'{PREFIX}_cache_hit_ratio{{cache="{name}"}} {info.hits / lookups if lookups else 0}')
+    lines.append(f'# TYPE {PREFIX}_cache_entries gauge')
+    for name, cache_info in sorted(metrics.caches.items()):
+        lines.append(f'{PREFIX}_cache_entries{{cache="{name}"}} {cache_info().currsize}')
+
+    return '\n'.join(lines) + '\n'
+
+
+_log_lock = threading.Lock()
+
+
+class CallbackTimer:
+    """Times the stages of one callback call.
+
+        with CallbackTimer('update_stress_change') as timer:
+            with timer.stage('settlement'):
+                ...
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.stages = {}
+        self.extra = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0) + time.perf_counter() - start
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        total = time.perf_counter() - self._start
+        status = 'ok' if exc_type is None else exc_type.__name__
+        metrics.increment('callback_calls_total', callback=self.callback, status=status)
+        for name, seconds in self.stages.items():
+            metrics.observe(seconds, callback=self.callback, stage=name)
+        metrics.observe(total, callback=self.callback, stage='total')
+
+        if TIMING_LOG:
+            record = {
+                'time': time.time(),
+                'pid': os.getpid(),
+                'callback': self.callback,
+                'status': status,
+                'total': total,
+                'stages': self.stages,
+                **self.extra,
+            }
+            with _log_lock, open(TIMING_LOG, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+        return False
@@ -0,0 +1,53 @@
+"""Opt-in background jobs for the long-running analyses.
+
+With BACKGROUND_JOBS=1 the sweep, Monte Carlo and stress volume callbacks run
+as Dash background callbacks instead of inside the request: each job runs in
+its own process, its progress and result go to a diskcache directory on the
+local disk that every gunicorn worker of the machine shares, and the browser
+polls for them. No broker is needed, only the optional requirements of
+
+    pip install -r requirements-jobs.txt
+
+The job store hands each finished figure to the browser once and does not
+keep it. What is reused is the computed arrays behind the figures, in the
+result store (sweeps and Monte Carlo samples) and the volume store, under a
+key of their inputs and of the calculation code. Submitting the same inputs
+again skips the calculation, and the figure is always drawn by the code and
+settings that are running.
+"""
+import os
+import tempfile
+
+BACKGROUND_JOBS = os.environ.get('BACKGROUND_JOBS', '0') != '0'
+
+# Directory of the job store
+JOB_DIR = os.environ.get('JOB_DIR', os.path.join(tempfile.gettempdir(), 'stress_in_soils_jobs'))
+
+# How often (ms) the browser asks for the progress and result of a running job
+JOB_POLL_INTERVAL = int(os.environ.get('JOB_POLL_INTERVAL', 500))
+
+
+def job_manager():
+    """DiskcacheManager of the background jobs, or None when BACKGROUND_JOBS is off."""
+    if not BACKGROUND_JOBS:
+        return None
+    import diskcache
+    from dash import DiskcacheManager
+
+    # Without cache_by, a result is removed from the job store once the browser has it
+    return DiskcacheManager(diskcache.Cache(JOB_DIR))
+
+
+def progress_reporter(set_progress):
+    """progress callback of the calculations that sends the percentage done to set_progress.
+
+    Only whole percent changes are sent, since each one is a write to the job store.
+    """
+    last = [-1]
+
+    def report(fraction):
+        percent = int(100 * fraction)
+        if percent != last[0]:
+            last[0] = percent
+            set_progress((percent, f'{percent} %'))
+    return report
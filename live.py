@@ -0,0 +1,40 @@
+"""Request sequencing for the live update mode.
+
+In live mode the browser debounces input changes and numbers each request
+of its session. RequestSequencer remembers the newest number per session, so
+a callback can check between its stages whether a newer request of the same
+session has started and drop the rest of its work. This needs a threaded
+server (the Flask development server or gunicorn with --threads), where a
+newer request runs while an older one is still in progress.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+# Quiet time (ms) after the last input change before a live request is sent
+LIVE_DEBOUNCE_MS = int(os.environ.get('LIVE_DEBOUNCE_MS', 300))
+
+# Sessions remembered by a sequencer; the least recently active are forgotten first
+MAX_SESSIONS = 10_000
+
+
+class RequestSequencer:
+    def __init__(self, max_sessions=MAX_SESSIONS):
+        self._lock = threading.Lock()
+        self._latest = OrderedDict()
+        self.max_sessions = max_sessions
+
+    def start(self, session, seq):
+        """Register request seq of session; False if a newer one has already started."""
+        with self._lock:
+            if seq < self._latest.get(session, seq):
+                return False
+            self._latest[session] = seq
+            self._latest.move_to_end(session)
+            while len(self._latest) > self.max_sessions:
+                self._latest.popitem(last=False)
+            return True
+
+    def is_current(self, session, seq):
+        with self._lock:
+            return self._latest.get(session, seq) == seq
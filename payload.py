@@ -0,0 +1,129 @@
+"""Smaller JSON payloads for the figures sent to the browser.
+
+Plotly serializes every float with full precision. compact_figure rounds the
+contour values and all coordinates to what the graphs can show, and thins the
+long reference profiles with the Ramer-Douglas-Peucker algorithm, which keeps
+every vertex needed to draw the curve within a fraction of its extent.
+
+Sizes are those of the JSON Dash sends (to_json_plotly). The size before
+compaction costs a full precision encode, so it is only measured when the
+saving is logged, at DEBUG level.
+"""
+import logging
+
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+logger = logging.getLogger(__name__)
+
+# The contour levels are 0.1 apart and the hover label shows J with 3 decimals
+CONTOUR_DECIMALS = 3
+# Coordinates and profile values are kept to 1 mm / 0.001 kPa / 0.001 mm
+COORDINATE_DECIMALS = 3
+# Largest deviation of a decimated profile, as a fraction of its x and y extent
+PROFILE_TOLERANCE = 1e-3
+# Profiles shorter than this are sent as they are
+MIN_DECIMATED_POINTS = 50
+
+
+def payload_size(figure):
+    # Size in bytes of the JSON sent for this figure, encoded the way Dash does
+    return len(to_json_plotly(figure).encode('utf-8'))
+
+
+def decimate(x, y, tolerance=PROFILE_TOLERANCE):
+    """Indices of the points of the polyline (x, y) kept by Ramer-Douglas-Peucker.
+
+    Both coordinates are scaled to their extent, so tolerance is relative.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    points = np.column_stack([
+        (x - x.min()) / (np.ptp(x) or 1),
+        (y - y.min()) / (np.ptp(y) or 1),
+    ])
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        segment = end - start
+        inner = points[first + 1:last] - start
+        length = np.hypot(*segment)
+        if length == 0:
+            distance = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distance = np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
+        i = int(np.argmax(distance))
+        if distance[i] > tolerance:
+            split = first + 1 + i
+            keep[split] = True
+            stack.extend([(first, split), (split, last)])
+    return np.flatnonzero(keep)
+
+
+def _coordinate_decimals(values):
+    # At least COORDINATE_DECIMALS, and enough to keep neighbouring grid lines apart
+    spacing = np.diff(np.unique(values))
+    if spacing.size == 0 or spacing.min() <= 0:
+        return COORDINATE_DECIMALS
+    return max(COORDINATE_DECIMALS, int(np.ceil(-np.log10(spacing.min()))) + 1)
+
+
+def compact_trace(trace):
+    """Compact copy of a trace dict (see compact_figure)."""
+    trace = dict(trace)
+    if trace.get('type') == 'contour':
+        trace['z'] = np.round(np.asarray(trace['z'], dtype=float), CONTOUR_DECIMALS)
+        for key in ('x', 'y'):
+            values = np.asarray(trace[key], dtype=float)
+            trace[key] = np.round(values, _coordinate_decimals(values))
+    elif trace.get('type') == 'scatter' and 'x' in trace and 'y' in trace:
+        x = np.asarray(trace['x'], dtype=float)
+        y = np.asarray(trace['y'], dtype=float)
+        if (trace.get('mode') == 'lines' and len(x) >= MIN_DECIMATED_POINTS
+                and np.isfinite(x).all() and np.isfinite(y).all()):
+            kept = decimate(x, y)
+            x, y = x[kept], y[kept]
+        trace['x'] = np.round(x, COORDINATE_DECIMALS)
+        trace['y'] = np.round(y, COORDINATE_DECIMALS)
+    return trace
+
+
+def compact_figure(figure, compacted=None, measure_before=False):
+    """Compact copy of a figure dict; returns (figure, bytes before, bytes after).
+
+    compacted maps the index of a trace to its compact_trace, e.g. one that
+    was cached, which is used instead of compacting the trace again. bytes
+    before is None unless measure_before.
+    """
+    before = payload_size(figure) if measure_before else None
+    traces = figure.get('data', [])
+    compacted = {index % len(traces): trace for index, trace in (compacted or {}).items()}
+    data = [compacted[i] if i in compacted else compact_trace(trace) for i, trace in enumerate(traces)]
+
+    compact = dict(figure, data=data)
+    after = payload_size(compact)
+    return compact, before, after
+
+
+def compact_figures(*figures, compacted=None):
+    """compact_figure for each figure; returns (figures, bytes before, bytes after).
+
+    compacted holds the compacted argument of each figure, if any. The bytes
+    saved are logged at DEBUG level; otherwise bytes before is None.
+    """
+    measure_before = logger.isEnabledFor(logging.DEBUG)
+    results = [compact_figure(figure, cached, measure_before)
+               for figure, cached in zip(figures, compacted or [None] * len(figures))]
+    after = sum(r[2] for r in results)
+    if not measure_before:
+        return [r[0] for r in results], None, after
+    before = sum(r[1] for r in results)
+    logger.debug('figure payload: %d bytes -> %d bytes (%s)', before, after,
+                 ', '.join(f'{r[1]} -> {r[2]}' for r in results))
+    return [r[0] for r in results], before, after
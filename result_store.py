@@ -0,0 +1,229 @@
+"""Content-addressed store of computed arrays on the local disk.
+
+The in-process caches (the contour trace LRU of the app) are per worker and
+start cold. ResultStore sits below them: an entry is a directory
+named by the SHA-256 of a canonical JSON of its inputs, with one .npy file
+per array and a manifest of their names, so every worker process on the
+machine, and the next restart, finds what any of them computed. Entries are
+written to a temporary directory and renamed into place, so a reader never
+sees a partial one, and are loaded as read-only memory maps. An entry that
+lost some of its files to an eviction in another process is a miss.
+
+Entries unused for RESULT_STORE_MAX_AGE seconds are removed, and the least
+recently used ones while the store is larger than RESULT_STORE_MAX_BYTES.
+"""
+import collections
+import contextlib
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Set RESULT_STORE=0 to compute everything in process
+RESULT_STORE = os.environ.get('RESULT_STORE', '1') != '0'
+
+RESULT_STORE_DIR = os.environ.get('RESULT_STORE_DIR',
+                                  os.path.join(tempfile.gettempdir(), 'stress_in_soils_results'))
+RESULT_STORE_MAX_BYTES = int(os.environ.get('RESULT_STORE_MAX_BYTES', 1 << 30))
+RESULT_STORE_MAX_AGE = int(os.environ.get('RESULT_STORE_MAX_AGE', 30 * 24 * 3600))
+
+# Seconds between two evictions by the same process; a store never runs one per write
+EVICT_INTERVAL = 60
+
+# Temporary directories older than this (s) are left over from a crashed writer
+PARTIAL_MAX_AGE = 3600
+
+# Names of the arrays of an entry, written last
+MANIFEST = 'manifest.json'
+
+# Same fields as functools.lru_cache cache_info, for metrics.register_cache
+StoreInfo = collections.namedtuple('StoreInfo', 'hits misses maxsize currsize')
+
+
+def _canonical(value):
+    # 4 and 4.0, tuples and lists, numpy and Python numbers all hash the same
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, np.ndarray):
+        return [_canonical(v) for v in value.tolist()]
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (bool, str)) or value is None:
+        return value
+    return float(value)
+
+
+@functools.lru_cache(maxsize=None)
+def engine_version():
+    """Hash of the source of calculations.py and volume.py, part of the inputs of every stored result."""
+    # Imported here: volume stores its results in a ResultStore
+    import calculations
+    import volume
+
+    source = ''.join(inspect.getsource(module) for module in (calculations, volume))
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]
+
+
+def result_key(namespace, inputs):
+    """Key of the entry of namespace computed from inputs (a JSON-like structure of numbers)."""
+    text = json.dumps([namespace, _canonical(inputs)], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ResultStore:
+    def __init__(self, directory=RESULT_STORE_DIR, max_bytes=RESULT_STORE_MAX_BYTES, max_age=RESULT_STORE_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._last_eviction = float('-inf')
+        # Entries in the store, counted by the last scan and updated by this process since
+        self._entry_count = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """The arrays of an entry, as read-only memory maps; None if it is not stored."""
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+                names = json.load(f)
+            arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in names}
+            # The modification time of the entry is its last use
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            # Not stored, or evicted while being read: a directory left without some of its
+            # files is removed, so the entry can be stored again
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+                with self._lock:
+                    if self._entry_count:
+                        self._entry_count -= 1
+            return None
+        return arrays
+
+    @contextlib.contextmanager
+    def writing(self, key, names):
+        """Context of a temporary directory to write the files <name>.npy of an entry into.
+
+        The entry is stored under key when the block exits, and discarded if it
+        raises; an entry already stored by another process is kept.
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = tempfile.mkdtemp(prefix=f'.{key}.', dir=os.path.dirname(path))
+        try:
+            yield partial
+            with open(os.path.join(partial, MANIFEST), 'w', encoding='utf-8') as f:
+                json.dump(list(names), f)
+            os.rename(partial, path)
+            with self._lock:
+                if self._entry_count is not None:
+                    self._entry_count += 1
+        except OSError:
+            # Renaming onto an existing, non-empty entry fails: someone else stored it first
+            shutil.rmtree(partial, ignore_errors=True)
+            if not os.path.isdir(path):
+                raise
+        except BaseException:
+            shutil.rmtree(partial, ignore_errors=True)
+            raise
+        self.maybe_evict()
+
+    def put(self, key, arrays):
+        """Store a dict of arrays under key; an entry already stored by another process is kept."""
+        with self.writing(key, arrays) as partial:
+            for name, array in arrays.items():
+                np.save(os.path.join(partial, f'{name}.npy'), np.asarray(array))
+
+    def get_or_compute(self, namespace, inputs, compute):
+        """Stored arrays of namespace for inputs, or store and return the dict of arrays compute() returns."""
+        if not RESULT_STORE:
+            return compute()
+        key = result_key(namespace, inputs)
+        arrays = self.get(key)
+        with self._lock:
+            if arrays is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if arrays is not None:
+            return arrays
+        arrays = compute()
+        try:
+            self.put(key, arrays)
+        except OSError as e:
+            # A full or read-only disk only costs the reuse
+            logger.warning('result store: cannot store %s: %s', namespace, e)
+        return arrays
+
+    def _entries(self):
+        # (path, last use, bytes, partial) of every entry and temporary directory
+        entries = []
+        try:
+            shards = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return entries
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    entries.append((entry.path, entry.stat().st_mtime, size, entry.name.startswith('.')))
+                except FileNotFoundError:
+                    continue
+        return entries
+
+    def maybe_evict(self):
+        with self._lock:
+            if time.monotonic() - self._last_eviction < EVICT_INTERVAL:
+                return
+            self._last_eviction = time.monotonic()
+        self.evict()
+
+    def evict(self):
+        """Remove entries older than max_age, then the least recently used above max_bytes."""
+        entries = sorted(self._entries(), key=lambda entry: entry[1], reverse=True)
+        now = time.time()
+        total = 0
+        removed = 0
+        for path, last_use, size, partial in entries:
+            if partial:
+                if now - last_use > PARTIAL_MAX_AGE:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            total += size
+            if now - last_use > self.max_age or total > self.max_bytes:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        with self._lock:
+            self._entry_count = sum(not entry[3] for entry in entries) - removed
+        if removed:
+            logger.info('result store: evicted %d of %d entries', removed, len(entries))
+        return removed
+
+    def cache_info(self):
+        # currsize is counted once, then kept up to date by put and evict instead of scanning the store
+        if self._entry_count is None:
+            count = sum(not entry[3] for entry in self._entries())
+            with self._lock:
+                if self._entry_count is None:
+                    self._entry_count = count
+        return StoreInfo(self.hits, self.misses, self.max_bytes, self._entry_count)
+
+
+store = ResultStore()
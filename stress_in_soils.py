@@ -1,13 +1,126 @@
+import functools
+import logging
 import os
 import dash
 from dash import dcc, html, dash_table
 from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+import flask
 import numpy as np
 import plotly.graph_objs as go
-import time
+
+from api import api
+from calculations import (LAYER_PREFIXES, REFERENCE_STEP, Footing, Scenario, adaptive_contour_grid, calculate,
+                          calculate_quadrature, calculate_section, contour_grid, default_layers, distortion,
+                          group_stress_change, influence_factor_grid, monte_carlo_settlement, reference_cache_info,
+                          reference_profile, sweep_settlement)
+from instrumentation import CallbackTimer, metrics, render_metrics
+from jobs import BACKGROUND_JOBS, JOB_POLL_INTERVAL, job_manager, progress_reporter
+from live import LIVE_DEBOUNCE_MS, RequestSequencer
+from payload import COORDINATE_DECIMALS, compact_figures, compact_trace
+from result_store import engine_version, store
+from volume import compute_volume, is_volume_key, plan_slice
+
+
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'))
+
+# Round and decimate the figures before they are sent (set to 0 to send full precision)
+COMPACT_PAYLOADS = os.environ.get('COMPACT_PAYLOADS', '1') != '0'
+
+# Number of soil layers in the layout; layers beyond the third start with zero thickness
+SOIL_LAYERS = int(os.environ.get('SOIL_LAYERS', 3))
+LAYERS = default_layers(SOIL_LAYERS)
+
+# Component ids of the States of the main figures, in order
+STATE_IDS = ['input-factor', 'water-table', 'a', 'b', 'q',
+             *[f'{prefix}{i}' for i in range(1, SOIL_LAYERS + 1) for prefix in LAYER_PREFIXES]]
+
+
+# Inputs a sweep can vary; thicknesses change the sublayer depths and are left out
+SWEEP_OPTIONS = [
+    {'label': 'a (m)', 'value': 'a'},
+    {'label': 'b (m)', 'value': 'b'},
+    {'label': 'q (kPa)', 'value': 'q'},
+    {'label': 'Water table (m)', 'value': 'water-table'},
+    *[{'label': f'{label}, layer {i}', 'value': f'{prefix}{i}'}
+      for i in range(1, SOIL_LAYERS + 1)
+      for prefix, label in (('gamma_', 'γd (kN/m³)'), ('gamma_r_', 'γsat (kN/m³)'), ('C_c_', 'Cc'),
+                            ('C_s_', 'Cs'), ('e_0_', 'e0'), ('OCR_', 'OCR'))],
+]
+SWEEP_MAX_POINTS = int(os.environ.get('SWEEP_MAX_POINTS', 200))
+
+# Uncertain soil properties of the Monte Carlo panel and their default coefficients of variation
+MONTE_CARLO_COV = (('C_c', 'Cc', 0.3), ('C_s', 'Cs', 0.3), ('e_0', 'e0', 0.15), ('OCR', 'OCR', 0.2))
+MONTE_CARLO_PERCENTILES = (5, 50, 95)
+MONTE_CARLO_MAX_REALIZATIONS = int(os.environ.get('MONTE_CARLO_MAX_REALIZATIONS', 1_000_000))
+MONTE_CARLO_BINS = 60
+
+# Columns of the footing group table: centre x, y (m), size a x b (m) and load q (kPa)
+FOOTING_COLUMNS = (('x', 'x (m)'), ('y', 'y (m)'), ('a', 'a (m)'), ('b', 'b (m)'), ('q', 'q (kPa)'))
+DEFAULT_FOOTINGS = [{'x': x, 'y': y, 'a': 2, 'b': 2, 'q': 100} for x in (0, 4) for y in (0, 4)]
+# Grid points per axis of the footing group plan view
+GROUP_GRID_POINTS = int(os.environ.get('GROUP_GRID_POINTS', 150))
+
+# Largest grid of the stress volume panel, points along x and y and depth slices
+VOLUME_MAX_PLAN_POINTS = int(os.environ.get('VOLUME_MAX_PLAN_POINTS', 200))
+VOLUME_MAX_DEPTH_POINTS = int(os.environ.get('VOLUME_MAX_DEPTH_POINTS', 400))
+
+
+def info_tooltip(text):
+    return html.Div(className='tooltip', children=[
+        html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'),
+        html.Span(text, className='tooltiptext')
+    ])
+
+
+def job_controls(name):
+    # Progress bar and cancel button of a background job; hidden when the jobs run in the request
+    return html.Div(style={'display': 'flex' if BACKGROUND_JOBS else 'none', 'alignItems': 'center',
+                           'gap': '0.5vw', 'marginTop': '1vh'}, children=[
+        html.Progress(id=f'{name}-progress', value=0, max=100, style={'flexGrow': 1}),
+        html.Span(id=f'{name}-progress-label'),
+        html.Button('Cancel', id=f'{name}-cancel', n_clicks=0, disabled=True),
+    ])
+
+
+def layer_slider(i, layer):
+    # Thickness slider of layer i
+    return [
+        html.Label(children=['Z', html.Sub(str(i)), ' (m)', info_tooltip(f'Thickness of layer {i}.')], className='slider-label'),
+        dcc.Slider(
+            id=f'z-{i}', min=0, max=20, step=0.25, value=layer.thickness,
+            marks={i: f'{i}' for i in range(0, 21, 5)},
+            className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
+        ),
+    ]
+
+
+def layer_properties(i, layer):
+    # Heading and inputs of the soil properties of layer i
+    return [
+        html.H3(f'Layer {i}:', style={'textAlign': 'left'}, className='h3'),
+        html.Label(['γ', html.Sub('d'), info_tooltip(f'Dry unit weight of Layer {i}'), ' (kN/m³)'], className='input-label'),
+        dcc.Input(id=f'gamma_{i}', type='number', value=layer.gamma, step=0.01, className='input-field'),
+        html.Label(['γ', html.Sub('sat'), info_tooltip(f'Saturated unit weight of Layer {i}'), ' (kN/m³)'], className='input-label'),
+        dcc.Input(id=f'gamma_r_{i}', type='number', value=layer.gamma_r, step=0.01, className='input-field'),
+        html.Div(style={'display': 'flex', 'alignItems': 'center', 'whiteSpace': 'nowrap'}, children=[
+            html.Label(['γ′', info_tooltip(f'Submerged unit weight of Layer {i}')],
+                       className='input-label', style={'marginRight': '5px'}),
+            html.Div(id=f'gamma_prime_{i}', className='input-field')
+        ]),
+        html.Label(['C', html.Sub('c'), info_tooltip(f'Compression index of Layer {i}')], className='input-label'),
+        dcc.Input(id=f'C_c_{i}', type='number', value=layer.C_c, step=0.001, className='input-field'),
+        html.Label(['C', html.Sub('s'), info_tooltip(f'Swelling index of Layer {i}')], className='input-label'),
+        dcc.Input(id=f'C_s_{i}', type='number', value=layer.C_s, step=0.0001, className='input-field'),
+        html.Label(['e', html.Sub('0'), info_tooltip(f'initial void ratio of Layer {i}')], className='input-label'),
+        dcc.Input(id=f'e_0_{i}', type='number', value=layer.e_0, step=0.01, className='input-field'),
+        html.Label(['OCR', info_tooltip(f'OverConsolidation ratio of Layer {i}')], className='input-label'),
+        dcc.Input(id=f'OCR_{i}', type='number', value=layer.OCR, step=0.1, className='input-field'),
+    ]
 
 
-app = dash.Dash(__name__, meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}])
+app = dash.Dash(__name__, meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}],
+                background_callback_manager=job_manager())
 
 app.title = 'Stress in Soils'
 app._favicon = ('assets/favicon.ico')
@@ -22,47 +135,18 @@ app.layout = html.Div([
 
             # Add the update button
             html.Button("Update Graphs", id='update-button', n_clicks=0, style={'width': '100%', 'height': '5vh', 'marginBottom': '1vh'}),
+            # Recompute as the inputs change, instead of on the button
+            dcc.Checklist(id='live-mode', options=[{'label': ' Live update', 'value': 'live'}], value=[],
+                          style={'marginBottom': '1vh'}),
+            dcc.Store(id='live-request'),
+            # What the soil layers and stress change figures were last drawn for, to patch them
+            dcc.Store(id='soil-layers-key'),
+            dcc.Store(id='stress-change-key'),
 
             # Sliders for each layer
             html.Div(className='slider-container', children=[
-                # Layer 1 Slider
-                html.Label(children=[
-                    'Z', html.Sub('1'), ' (m)', 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Thickness of layer 1.', className='tooltiptext')
-                            ])], className='slider-label'),
-                dcc.Slider(
-                    id='z-1', min=0, max=20, step=0.25, value=4,
-                    marks={i: f'{i}' for i in range(0, 21, 5)},
-                    className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
-                ),
-
-                # Layer 2 Slider
-                html.Label(children=[
-                    'Z', html.Sub('2'), ' (m)', 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Thickness of layer 2.', className='tooltiptext')
-                            ])], className='slider-label'),
-                dcc.Slider(
-                    id='z-2', min=0, max=20, step=0.25, value=4,
-                    marks={i: f'{i}' for i in range(0, 21, 5)},
-                    className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
-                ),
-
-                # Layer 3 Slider
-                html.Label(children=[
-                    'Z', html.Sub('3'), ' (m)', 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Thickness of layer 3.', className='tooltiptext')
-                            ])], className='slider-label'),
-                dcc.Slider(
-                    id='z-3', min=0, max=20, step=0.25, value=4,
-                    marks={i: f'{i}' for i in range(0, 21, 5)},
-                    className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
-                ),
+                # Thickness slider of each layer
+                *[component for i, layer in enumerate(LAYERS, start=1) for component in layer_slider(i, layer)],
 
                 # Water table slider
                 html.Label(children=[
@@ -103,146 +187,8 @@ app.layout = html.Div([
                 dcc.Input(id='q', type='number', value=100, step=1, className='input-field'),
 
 
-                # Layer 1 Properties
-                html.H3('Layer 1:', style={'textAlign': 'left'}, className='h3'),
-                html.Label([f'γ', html.Sub('d'), 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Dry unit weight of Layer 1', className='tooltiptext')
-                            ]),' (kN/m³)'], className='input-label'),
-                dcc.Input(id='gamma_1', type='number', value=18, step=0.01, className='input-field'),
-                html.Label([f'γ', html.Sub('sat'), 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Saturated unit weight of Layer 1', className='tooltiptext')
-                            ]),' (kN/m³)'], className='input-label'),
-                dcc.Input(id='gamma_r_1', type='number', value=19, step=0.01, className='input-field'),
-                html.Div(style={'display': 'flex', 'alignItems': 'center', 'whiteSpace': 'nowrap'}, children=[
-                    html.Label([f'γ′', 
-                                html.Div(className='tooltip', children=[
-                                    html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                    html.Span('Submerged unit weight of Layer 1', className='tooltiptext')
-                                ])], className='input-label', style={'marginRight': '5px'}),
-                    html.Div(id='gamma_prime_1', className='input-field')  
-                ]),
-                html.Label([f'C', html.Sub('c'), 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Compression index of Layer 1', className='tooltiptext')
-                            ])], className='input-label'),
-                dcc.Input(id='C_c_1', type='number', value=0.1, step=0.001, className='input-field'),
-                html.Label([f'C', html.Sub('s'), 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Swelling index of Layer 1', className='tooltiptext')
-                            ])], className='input-label'),
-                dcc.Input(id='C_s_1', type='number', value=0.05, step=0.0001, className='input-field'),
-                html.Label([f'e', html.Sub('0'), 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('initial void ratio of Layer 1', className='tooltiptext')
-                            ])], className='input-label'),
-                dcc.Input(id='e_0_1', type='number', value=2, step=0.01, className='input-field'),
-                html.Label(["OCR", 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('OverConsolidation ratio of Layer 1', className='tooltiptext')
-                            ])], className='input-label'),
-                dcc.Input(id='OCR_1', type='number', value=1, step=0.1, className='input-field'),
-
-                # Layer 2 Properties
-                html.H3('Layer 2:', style={'textAlign': 'left'}, className='h3'),
-                html.Label([f'γ', html.Sub('d'), 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Dry unit weight of Layer 2', className='tooltiptext')
-                            ]),' (kN/m³)'], className='input-label'),
-                dcc.Input(id='gamma_2', type='number', value=19, step=0.01, className='input-field'),
-                html.Label([f'γ', html.Sub('sat'), 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Saturated unit weight of Layer 2', className='tooltiptext')
-                            ]),' (kN/m³)'], className='input-label'),
-                dcc.Input(id='gamma_r_2', type='number', value=21, step=0.01, className='input-field'),
-                html.Div(style={'display': 'flex', 'alignItems': 'center', 'whiteSpace': 'nowrap'}, children=[
-                    html.Label([f'γ′', 
-                                html.Div(className='tooltip', children=[
-                                    html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                    html.Span('Submerged unit weight of Layer 2', className='tooltiptext')
-                                ])], className='input-label', style={'marginRight': '5px'}),
-                    html.Div(id='gamma_prime_2',className='input-field')  
-                ]),
-                html.Label([f'C', html.Sub('c'), 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Compression index of Layer 2', className='tooltiptext')
-                            ])], className='input-label'),
-                dcc.Input(id='C_c_2', type='number', value=0.1, step=0.001, className='input-field'),
-                html.Label([f'C', html.Sub('s'), 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Swelling index of Layer 2', className='tooltiptext')
-                            ])], className='input-label'),
-                dcc.Input(id='C_s_2', type='number', value=0.05, step=0.0001, className='input-field'),
-                html.Label([f'e', html.Sub('0'), 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('initial void ratio of Layer 2', className='tooltiptext')
-                            ])], className='input-label'),
-                dcc.Input(id='e_0_2', type='number', value=2, step=0.0001, className='input-field'),
-                html.Label(["OCR", 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('OverConsolidation ratio of Layer 2', className='tooltiptext')
-                            ])], className='input-label'),
-                dcc.Input(id='OCR_2', type='number', value=1, step=0.1, className='input-field'),
-
-                # Layer 3 Properties
-                html.H3('Layer 3:', style={'textAlign': 'left'}, className='h3'),
-                html.Label([f'γ', html.Sub('d'), 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Dry unit weight of Layer 3', className='tooltiptext')
-                            ]),' (kN/m³)'], className='input-label'),
-                dcc.Input(id='gamma_3', type='number', value=18, step=0.01, className='input-field'),
-                html.Label([f'γ', html.Sub('sat'), 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Saturated unit weight of Layer 3', className='tooltiptext')
-                            ]),' (kN/m³)'], className='input-label'),
-                dcc.Input(id='gamma_r_3', type='number', value=19, step=0.01, className='input-field'),
-                html.Div(style={'display': 'flex', 'alignItems': 'center', 'whiteSpace': 'nowrap'}, children=[
-                    html.Label([f'γ′', 
-                                html.Div(className='tooltip', children=[
-                                    html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                    html.Span('Submerged unit weight of Layer 3', className='tooltiptext')
-                                ])], className='input-label', style={'marginRight': '5px'}),
-                    html.Div(id='gamma_prime_3', className='input-field')  
-                ]),
-                html.Label([f'C', html.Sub('c'), 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Compression index of Layer 3', className='tooltiptext')
-                            ])], className='input-label'),
-                dcc.Input(id='C_c_3', type='number', value=0.1, step=0.001, className='input-field'),
-                html.Label([f'C', html.Sub('s'), 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('Swelling index of Layer 3', className='tooltiptext')
-                            ])], className='input-label'),
-                dcc.Input(id='C_s_3', type='number', value=0.05, step=0.0001, className='input-field'),
-                html.Label([f'e', html.Sub('0'), 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('initial void ratio of Layer 3', className='tooltiptext')
-                            ])], className='input-label'),
-                dcc.Input(id='e_0_3', type='number', value=2, step=0.01, className='input-field'),
-                html.Label(["OCR", 
-                            html.Div(className='tooltip', children=[
-                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                                html.Span('OverConsolidation ratio of Layer 3', className='tooltiptext')
-                            ])], className='input-label'),
-                dcc.Input(id='OCR_3', type='number', value=1, step=0.1, className='input-field'),
+                # Properties of each layer
+                *[component for i, layer in enumerate(LAYERS, start=1) for component in layer_properties(i, layer)],
             ]),
         ]),
 
@@ -271,7 +217,10 @@ app.layout = html.Div([
                         html.Div(
                             style={'height': '80%'},  # Second graph takes the remaining 50% of the height
                             children=[
-                                dcc.Graph(id='soil-layers-graph', style={'height': '80%', 'width': '100%'})
+                                dcc.Graph(id='soil-layers-graph', style={'height': '55%', 'width': '100%'}),
+                                # Settlement along section A-A, on the same x axis as the soil layers
+                                dcc.Graph(id='section-settlement-graph', style={'height': '25%', 'width': '100%'}),
+                                html.Div(id='section-summary', className='table-cell'),
                             ]
                         ),
                     ]
@@ -317,6 +266,15 @@ app.layout = html.Div([
                                                     ),
                                                     html.Td(id='sett_pref', children='', className='table-cell'),
                                                 ]),
+                                                html.Tr([
+                                                    html.Td('Quadrature', className='table-cell'),
+                                                    html.Td(id='sett_quad', children='', className='table-cell'),
+                                                ]),
+                                                # Percentiles of the last Monte Carlo run
+                                                *[html.Tr([
+                                                    html.Td(f'Monte Carlo P{p}', className='table-cell'),
+                                                    html.Td(id=f'sett_p{p}', children='', className='table-cell'),
+                                                ]) for p in MONTE_CARLO_PERCENTILES],
                                             ])
                                         ]
                                     )
@@ -343,46 +301,202 @@ app.layout = html.Div([
                 'z-index': '1000',  # Ensure it's on top of other elements
             }
         )
-    ])
+    ]),
+
+    # Parameter sweep: total settlement under E over the grid of two inputs
+    html.Div(id='sweep-container', style={'display': 'flex', 'flexDirection': 'row', 'width': '100%'}, children=[
+        html.Div(className='layer-properties', style={'width': '25%', 'padding': '2%'}, children=[
+            html.H3('Parameter sweep:', style={'textAlign': 'left'}, className='h3'),
+            html.Label(['x', info_tooltip('Input on the horizontal axis and its range')], className='input-label'),
+            dcc.Dropdown(id='sweep-x', options=SWEEP_OPTIONS, value='a', clearable=False),
+            dcc.Input(id='sweep-x-from', type='number', value=1, className='input-field'),
+            dcc.Input(id='sweep-x-to', type='number', value=8, className='input-field'),
+            html.Label(['y', info_tooltip('Input on the vertical axis and its range')], className='input-label'),
+            dcc.Dropdown(id='sweep-y', options=SWEEP_OPTIONS, value='b', clearable=False),
+            dcc.Input(id='sweep-y-from', type='number', value=0.5, className='input-field'),
+            dcc.Input(id='sweep-y-to', type='number', value=4, className='input-field'),
+            html.Label(['Points', info_tooltip('Values per axis; the sweep evaluates points × points scenarios')],
+                       className='input-label'),
+            dcc.Input(id='sweep-points', type='number', value=50, min=2, max=SWEEP_MAX_POINTS, step=1, className='input-field'),
+            html.Button("Run Sweep", id='sweep-button', n_clicks=0, style={'width': '100%', 'height': '5vh', 'marginTop': '1vh'}),
+            job_controls('sweep'),
+        ]),
+        html.Div(style={'width': '75%'}, children=[
+            dcc.Graph(id='sweep-graph', style={'height': '60vh', 'width': '100%'})
+        ]),
+    ]),
+
+    # Monte Carlo: distribution of the total settlement under E for uncertain soil properties
+    html.Div(id='monte-carlo-container', style={'display': 'flex', 'flexDirection': 'row', 'width': '100%'}, children=[
+        html.Div(className='layer-properties', style={'width': '25%', 'padding': '2%'}, children=[
+            html.H3('Monte Carlo:', style={'textAlign': 'left'}, className='h3'),
+            html.Label(['Distribution', info_tooltip('Distribution of each property around its input value')],
+                       className='input-label'),
+            dcc.Dropdown(id='mc-distribution', options=[{'label': 'Lognormal', 'value': 'lognormal'},
+                                                        {'label': 'Normal', 'value': 'normal'}],
+                         value='lognormal', clearable=False),
+            *[component for name, label, cov in MONTE_CARLO_COV for component in [
+                html.Label([label, info_tooltip(f'Coefficient of variation of {label} in every layer')],
+                           className='input-label'),
+                dcc.Input(id=f'mc-cov-{name}', type='number', value=cov, min=0, step=0.01, className='input-field'),
+            ]],
+            html.Label(['Realizations', info_tooltip('Number of random soil profiles')], className='input-label'),
+            dcc.Input(id='mc-realizations', type='number', value=10_000, min=1, max=MONTE_CARLO_MAX_REALIZATIONS,
+                      step=1, className='input-field'),
+            html.Button("Run Monte Carlo", id='mc-button', n_clicks=0,
+                        style={'width': '100%', 'height': '5vh', 'marginTop': '1vh'}),
+            job_controls('mc'),
+        ]),
+        html.Div(style={'width': '75%'}, children=[
+            dcc.Graph(id='mc-graph', style={'height': '60vh', 'width': '100%'})
+        ]),
+    ]),
+
+    # Footing group: plan view of the superposed stress increase at one depth
+    html.Div(id='footing-group-container', style={'display': 'flex', 'flexDirection': 'row', 'width': '100%'}, children=[
+        html.Div(className='layer-properties', style={'width': '25%', 'padding': '2%'}, children=[
+            html.H3('Footing group:', style={'textAlign': 'left'}, className='h3'),
+            dash_table.DataTable(
+                id='footings-table',
+                columns=[{'name': name, 'id': column, 'type': 'numeric'} for column, name in FOOTING_COLUMNS],
+                data=DEFAULT_FOOTINGS,
+                editable=True,
+                row_deletable=True,
+                page_size=10,
+                style_cell={'textAlign': 'center', 'minWidth': '40px'},
+            ),
+            html.Button("Add Footing", id='add-footing-button', n_clicks=0,
+                        style={'width': '100%', 'height': '4vh', 'marginTop': '1vh'}),
+            html.Label(['Depth', info_tooltip('Depth of the plan view'), ' (m)'], className='input-label'),
+            dcc.Input(id='group-depth', type='number', value=2, min=0.01, step=0.1, className='input-field'),
+            html.Button("Update Group", id='group-button', n_clicks=0,
+                        style={'width': '100%', 'height': '5vh', 'marginTop': '1vh'}),
+        ]),
+        html.Div(style={'width': '75%'}, children=[
+            dcc.Graph(id='group-graph', style={'height': '60vh', 'width': '100%'})
+        ]),
+    ]),
+
+    # Stress volume: 3D stress increase below the footing, stored on disk and viewed in plan slices
+    html.Div(id='volume-container', style={'display': 'flex', 'flexDirection': 'row', 'width': '100%'}, children=[
+        html.Div(className='layer-properties', style={'width': '25%', 'padding': '2%'}, children=[
+            html.H3('Stress volume:', style={'textAlign': 'left'}, className='h3'),
+            html.Label(['Plan points', info_tooltip('Grid points along x and along y')], className='input-label'),
+            dcc.Input(id='volume-plan-points', type='number', value=100, min=2, max=VOLUME_MAX_PLAN_POINTS, step=1,
+                      className='input-field'),
+            html.Label(['Depth slices', info_tooltip('Grid points over the total depth')], className='input-label'),
+            dcc.Input(id='volume-depth-points', type='number', value=100, min=2, max=VOLUME_MAX_DEPTH_POINTS, step=1,
+                      className='input-field'),
+            html.Button("Compute Volume", id='volume-button', n_clicks=0,
+                        style={'width': '100%', 'height': '5vh', 'marginTop': '1vh'}),
+            job_controls('volume'),
+            html.Label(['Depth', info_tooltip('Depth of the plan view, read from the stored volume'), ' (m)'],
+                       className='slider-label'),
+            dcc.Slider(id='volume-depth', min=0, max=12, step=0.05, value=2,
+                       marks={i: f'{i}' for i in range(0, 13, 4)},
+                       className='slider', tooltip={'placement': 'bottom', 'always_visible': True}),
+            dcc.Store(id='volume-key'),
+        ]),
+        html.Div(style={'width': '75%'}, children=[
+            dcc.Graph(id='volume-graph', style={'height': '60vh', 'width': '100%'})
+        ]),
+    ]),
 ])
 
-# Callback to control the bounderies of the input fields and sliders
-@app.callback(
-    [Output(f'gamma_prime_{i}', 'children') for i in range(1, 4)] + [Output('b', 'value')],
-    [Output(f'OCR_{i}', 'value') for i in range(1, 4)],
-    Output('water-table', 'max'),
-    Output('input-factor', 'max'),
-    [Input(f'z-{i}', 'value') for i in range(1, 4)],
-    [Input(f'gamma_r_{i}', 'value') for i in range(1, 4)],
-    Input('a', 'value'),
-    Input('b', 'value'),
-    [Input(f'OCR_{i}', 'value') for i in range(1, 4)],
-    
+# Callback to control the bounderies of the input fields and sliders.
+# It runs in the browser, so keystrokes never reach the server.
+app.clientside_callback(
+    """
+    function(...args) {
+        // args: the thickness of every layer, their saturated unit weights, a, b, their OCRs
+        const n = (args.length - 2) / 3;
+        const z = args.slice(0, n);
+        const gamma_r = args.slice(n, 2 * n);
+        const a_value = args[2 * n];
+        let b_value = args[2 * n + 1];
+        const OCR = args.slice(2 * n + 2);
+
+        // Leave every output as it is while an input is empty
+        if ([...z, a_value, b_value, ...OCR].some(v => v === null || v === undefined)) {
+            throw window.dash_clientside.PreventUpdate;
+        }
+
+        // Ensure b does not exceed a
+        if (b_value > a_value) {
+            b_value = a_value;
+        }
+
+        // if one or more of the layers is zero thick set the input factor the minimum of the others
+        const thicknesses = z.filter(v => v !== 0);
+        if (thicknesses.length === 0) {
+            throw window.dash_clientside.PreventUpdate;
+        }
+        const inputfactor_max = Math.min(...thicknesses);
+
+        // insure water table is not below the maximum depth
+        const water_table_max = z.reduce((total, v) => total + v, 0);
+
+        // Calculate γ′ as γ_r - 10, formatted like Python's round(value, 2)
+        function gamma_prime(gamma_r) {
+            if (gamma_r === null || gamma_r === undefined) {
+                return '= None kN/m³';
+            }
+            const value = gamma_r - 10;
+            if (Number.isInteger(gamma_r)) {
+                return `= ${value} kN/m³`;
+            }
+            let rounded = Number(value.toFixed(2));
+            // toFixed rounds exact ties away from zero, Python rounds them to even
+            if (Number.isInteger(value * 8) && !Number.isInteger(value * 4)) {
+                const lower = Math.floor(value * 100);
+                rounded = (lower % 2 === 0 ? lower : lower + 1) / 100;
+            }
+            return `= ${Number.isInteger(rounded) ? rounded.toFixed(1) : rounded} kN/m³`;
+        }
+
+        // Ensure OCR is at least 1
+        return [...gamma_r.map(gamma_prime), b_value, ...OCR.map(v => Math.max(1, v)),
+                water_table_max, inputfactor_max];
+    }
+    """,
+    [Output(f'gamma_prime_{i}', 'children') for i in range(1, SOIL_LAYERS + 1)] + [Output('b', 'value')] +
+    [Output(f'OCR_{i}', 'value') for i in range(1, SOIL_LAYERS + 1)] +
+    [Output('water-table', 'max'), Output('input-factor', 'max')],
+    [Input(f'z-{i}', 'value') for i in range(1, SOIL_LAYERS + 1)] +
+    [Input(f'gamma_r_{i}', 'value') for i in range(1, SOIL_LAYERS + 1)] +
+    [Input('a', 'value'), Input('b', 'value')] +
+    [Input(f'OCR_{i}', 'value') for i in range(1, SOIL_LAYERS + 1)],
 )
-def update_gamma_prime(z1, z2, z3, gamma_r1, gamma_r2, gamma_r3, a_value, b_value, OCR1, OCR2, OCR3):
-    # Ensure b does not exceed a
-    if b_value > a_value:
-        b_value = a_value  # or return a message, e.g., "b cannot exceed a"
-    
-    # if one or more of z1, z2, z3 is zero set the input factor the minimum of the others
-    inputfactor_max = min([value for value in (z1, z2, z3) if value != 0]) 
 
-    # Ensure OCR is at least 1
-    OCR1 = max(1, OCR1)
-    OCR2 = max(1, OCR2)
-    OCR3 = max(1, OCR3)
-
-    # insure water table is not below the maximum depth
-    water_table_max = z1 + z2 + z3
-
-    # Calculate γ′ as γ_r - 9.81 for each layer
-    gamma_prime1 = round(gamma_r1 - 10, 2) if gamma_r1 is not None else None
-    gamma_prime2 = round(gamma_r2 - 10, 2) if gamma_r2 is not None else None
-    gamma_prime3 = round(gamma_r3 - 10, 2) if gamma_r3 is not None else None
-
-    return f"= {gamma_prime1} kN/m³", f"= {gamma_prime2} kN/m³", f"= {gamma_prime3} kN/m³", b_value, OCR1, OCR2, OCR3, water_table_max, inputfactor_max
 
 
+# Live mode: send a numbered request once the inputs have been still for LIVE_DEBOUNCE_MS.
+# Every change restarts the timer, so dragging a slider sends one request when it stops.
+app.clientside_callback(
+    """
+    function(live, ...values) {
+        const dc = window.dash_clientside;
+        const state = window.stressInSoilsLive = window.stressInSoilsLive || {
+            session: (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : String(Math.random()).slice(2),
+            seq: 0,
+            timer: null,
+        };
+        clearTimeout(state.timer);
+        if (!live || live.length === 0) {
+            return dc.no_update;
+        }
+        state.timer = setTimeout(() => {
+            state.seq += 1;
+            dc.set_props('live-request', {data: {session: state.session, seq: state.seq}});
+        }, %d);
+        return dc.no_update;
+    }
+    """ % LIVE_DEBOUNCE_MS,
+    Output('live-request', 'data'),
+    [Input('live-mode', 'value')] +
+    [Input(component_id, 'value') for component_id in STATE_IDS],
+    prevent_initial_call=True,
+)
 
 
 # # JavaScript for updating window width
@@ -397,68 +511,838 @@ def update_gamma_prime(z1, z2, z3, gamma_r1, gamma_r2, gamma_r3, a_value, b_valu
 # )
 
 
-# Callback to handle the animations and input updates
+# Contour of the influence factor on section A-A. It depends only on the
+# footing geometry and the total depth, so it is cached on those (rounded to
+# avoid float noise in the inputs) and reused when only soil properties change.
+CONTOUR_CACHE_SIZE = int(os.environ.get('CONTOUR_CACHE_SIZE', 32))
+
+# 'fixed' uses the 0.01*a / 0.2*a grid, 'adaptive' refines where the influence
+# factor changes fastest and keeps the grid within CONTOUR_POINT_BUDGET points
+CONTOUR_MESH = os.environ.get('CONTOUR_MESH', 'fixed')
+CONTOUR_POINT_BUDGET = int(os.environ.get('CONTOUR_POINT_BUDGET', 20000))
+
+# Part of the inputs of every stored result, so results of older calculations are not reused
+ENGINE_VERSION = engine_version()
+
+
+def contour_influence_grid(a, b, total_depth):
+    # (x, z, I) of the contour, computed once per machine and then read from the result store
+    x0_dim = 2*a - a/2
+    x1_dim = 2*a + a/2
+
+    def compute():
+        if CONTOUR_MESH == 'adaptive':
+            x, z = adaptive_contour_grid(a, b, total_depth, x0_dim, x1_dim, budget=CONTOUR_POINT_BUDGET)
+        else:
+            x, z = contour_grid(a, total_depth, x0_dim, x1_dim)
+        return {'x': x, 'z': z, 'I': influence_factor_grid(x, z, a, b, x0_dim, x1_dim, symmetric=True)}
+
+    inputs = {'a': a, 'b': b, 'total_depth': total_depth, 'mesh': CONTOUR_MESH, 'budget': CONTOUR_POINT_BUDGET,
+              'version': ENGINE_VERSION}
+    grid = store.get_or_compute('influence_grid', inputs, compute)
+    return grid['x'], grid['z'], grid['I']
+
+
+def build_contour_trace(a, b, total_depth):
+    x, z, I = contour_influence_grid(a, b, total_depth)
+
+    # Create the contour trace with only lines and no color fill
+    return go.Contour(
+        z=I,
+        x=x,
+        y=z,
+        contours=dict(
+            start=0,
+            end=0.9,
+            size=0.1,
+            showlabels=True,
+            # labelfont=dict(size=12, color='black')  # Ensures labels are visible
+        ),
+        colorscale='YlOrRd',  # Use 'Cividis' or 'Plasma' for alternatives
+        showscale=False,
+        showlegend=False,
+        hovertemplate='J: %{z:.3f}<br>x: %{x:.3f}<br>y: %{y:.3f}<extra></extra>'
+    )
+
+
+_contour_trace_lru = functools.lru_cache(maxsize=CONTOUR_CACHE_SIZE)(build_contour_trace)
+
+
+def cached_contour_trace(a, b, total_depth):
+    # add_trace copies the trace, so the cached object is never mutated
+    return _contour_trace_lru(round(a, 6), round(b, 6), round(total_depth, 6))
+
+
+@functools.lru_cache(maxsize=CONTOUR_CACHE_SIZE)
+def _compact_contour_lru(a, b, total_depth):
+    return compact_trace(_contour_trace_lru(a, b, total_depth).to_plotly_json())
+
+
+def compact_contour_trace(a, b, total_depth):
+    # compact_trace of cached_contour_trace, so the grid is not rounded again for every figure
+    return _compact_contour_lru(round(a, 6), round(b, 6), round(total_depth, 6))
+
+
+# Hits and misses of the contour cache
+contour_cache_info = _contour_trace_lru.cache_info
+metrics.register_cache('contour', contour_cache_info)
+metrics.register_cache('reference_profile', reference_cache_info)
+metrics.register_cache('result_store', store.cache_info)
+
+# Newest live request of each session
+sequencer = RequestSequencer()
+
+
+# The figures of the main row each have their own callback, so a cheap figure does not wait
+# for the settlement work of another one. All of them run on the update button and on live requests.
+UPDATE_INPUTS = [Input('update-button', 'n_clicks'), Input('live-request', 'data')]
+
+
+def live_key(live_request):
+    # (session, seq) of a live mode request, None for the button; an overtaken request is dropped
+    if not live_request or dash.callback_context.triggered_id != 'live-request':
+        return None
+    live = (live_request['session'], live_request['seq'])
+    if not sequencer.start(*live):
+        raise PreventUpdate
+    return live
+
+
+def live_stage(timer, live):
+    # timer.stage that first gives up if a newer live request of the session has started
+    def stage(name):
+        if live and not sequencer.is_current(*live):
+            metrics.increment('superseded_total', callback=timer.callback, stage=name)
+            raise PreventUpdate
+        return timer.stage(name)
+    return stage
+
+
+def send_figures(timer, *figures, compacted=None):
+    # The figures as they are sent to the browser, compacted unless COMPACT_PAYLOADS is off
+    if not COMPACT_PAYLOADS:
+        return list(figures)
+    with timer.stage('payload'):
+        figures, before, after = compact_figures(*(fig.to_dict() for fig in figures), compacted=compacted)
+    if before is not None:
+        metrics.increment('payload_bytes_total', before, kind='before')
+    metrics.increment('payload_bytes_total', after, kind='after')
+    timer.extra['payload_bytes'] = after
+    return figures
+
+
 @app.callback(
-    [Output('foundation-dimension-graph', 'figure'),
-     Output('soil-layers-graph', 'figure'),
-     Output('stress-change-graph', 'figure'),
+    Output('foundation-dimension-graph', 'figure'),
+    UPDATE_INPUTS,
+    [State('a', 'value'), State('b', 'value')]
+)
+def update_foundation(n_clicks, live_request, a, b):
+    live = live_key(live_request)
+    if a is None or b is None:
+        raise PreventUpdate
+    with CallbackTimer('update_foundation') as timer:
+        stage = live_stage(timer, live)
+        with stage('foundation_figure'):
+            foundation_fig = foundation_figure(a, b)
+        return send_figures(timer, foundation_fig)[0]
+
+
+def soil_layers_key(scenario, layers):
+    # What the soil layers figure was drawn for; see soil_layers_patch
+    return {
+        'a': scenario.a,
+        'b': scenario.b,
+        'total_depth': scenario.total_depth,
+        'water_table': scenario.water_table,
+        'tops': [layer['top'] for layer in layers if layer['thickness'] > 0],
+    }
+
+
+def soil_layers_patch(previous, current):
+    """Patch of the soil layers figure drawn for previous that redraws it for current.
+
+    Only the water table and the layer boundary lines can move this way; None
+    when anything else (the footing, the total depth or the number of layers)
+    has changed and the figure has to be rebuilt.
+    """
+    if not previous or any(previous[key] != current[key] for key in ('a', 'b', 'total_depth')):
+        return None
+    if len(previous['tops']) != len(current['tops']):
+        return None
+    def line(depth):
+        # Same as the coordinates of a compacted figure
+        return [round(depth, COORDINATE_DECIMALS) if COMPACT_PAYLOADS else depth] * 2
+
+    # Traces of soil_layers_figure: a line at each layer top, the bottom line, then the water table
+    patch = dash.Patch()
+    for i, (before, after) in enumerate(zip(previous['tops'], current['tops'])):
+        if before != after:
+            patch['data'][i]['y'] = line(after)
+    if previous['water_table'] != current['water_table']:
+        patch['data'][len(current['tops']) + 1]['y'] = line(current['water_table'])
+    return patch
+
+
+@app.callback(
+    [Output('soil-layers-graph', 'figure'),
+     Output('soil-layers-key', 'data')],
+    UPDATE_INPUTS,
+    [State('soil-layers-key', 'data')] +
+    [State(component_id, 'value') for component_id in STATE_IDS]
+)
+def update_soil_layers(n_clicks, live_request, previous, *values):
+    live = live_key(live_request)
+    scenario = scenario_from_states(values)
+    layers = soil_layers(scenario)
+    key = soil_layers_key(scenario, layers)
+    if key == previous:
+        raise PreventUpdate
+    patch = soil_layers_patch(previous, key)
+    if patch is not None:
+        metrics.increment('figure_patches_total', figure='soil_layers')
+        return patch, key
+
+    with CallbackTimer('update_soil_layers') as timer:
+        stage = live_stage(timer, live)
+        with stage('contour'):
+            contour_trace = cached_contour_trace(scenario.a, scenario.b, scenario.total_depth)
+        with stage('soil_layers_figure'):
+            soil_layers_fig = soil_layers_figure(layers, scenario.total_depth, scenario.water_table,
+                                                 scenario.a, scenario.b, contour_trace)
+        compacted = None
+        if COMPACT_PAYLOADS:
+            with stage('contour'):
+                # The contour is the last trace of the figure
+                compacted = [{-1: compact_contour_trace(scenario.a, scenario.b, scenario.total_depth)}]
+        return send_figures(timer, soil_layers_fig, compacted=compacted)[0], key
+
+
+def stress_change_key(scenario):
+    # The stress increase below point E, and the depths it is drawn at, only depend on these
+    return {
+        'sublayer_thickness': scenario.sublayer_thickness,
+        'a': scenario.a,
+        'b': scenario.b,
+        'q': scenario.q,
+        'thicknesses': list(scenario.thicknesses),
+    }
+
+
+@app.callback(
+    [Output('stress-change-graph', 'figure'),
      Output('sett_ref', 'children'),
-     Output('sett_pref', 'children')],
-    [Input('update-button', 'n_clicks')],
-    [State('input-factor', 'value'),
-     State('z-1', 'value'),
-     State('z-2', 'value'),
-     State('z-3', 'value'),
-     State('water-table', 'value'),
-     State('a', 'value'),
-     State('b', 'value'),
-     State('q', 'value'),
-     State('gamma_1', 'value'),
-     State('gamma_r_1', 'value'),
-     State('gamma_2', 'value'),
-     State('gamma_r_2', 'value'),
-     State('gamma_3', 'value'),
-     State('gamma_r_3', 'value'),
-     State('C_c_1', 'value'),
-     State('C_s_1', 'value'),
-     State('e_0_1', 'value'),
-     State('OCR_1', 'value'),
-     State('C_c_2', 'value'),
-     State('C_s_2', 'value'),
-     State('e_0_2', 'value'),
-     State('OCR_2', 'value'),
-     State('C_c_3', 'value'),
-     State('C_s_3', 'value'),
-     State('e_0_3', 'value'),
-     State('OCR_3', 'value')]
+     Output('sett_pref', 'children'),
+     Output('stress-change-key', 'data')],
+    UPDATE_INPUTS,
+    [State('stress-change-key', 'data')] +
+    [State(component_id, 'value') for component_id in STATE_IDS]
 )
+def update_stress_change(n_clicks, live_request, previous, *values):
+    live = live_key(live_request)
+    scenario = scenario_from_states(values)
+    layers = soil_layers(scenario)
+    key = stress_change_key(scenario)
+
+    with CallbackTimer('update_stress_change') as timer:
+        stage = live_stage(timer, live)
+        with stage('settlement'):
+            profiles = point_e_profiles(scenario)
+        if key == previous:
+            # Only the soil properties or the water table changed: build and send the settlement traces alone
+            metrics.increment('figure_patches_total', figure='stress_change')
+            with stage('stress_change_figure'):
+                settlement_fig = go.Figure(data=[settlement_trace(step, depths, settelment)
+                                                for step, depths, _, settelment, _ in profiles])
+            stress_change_fig = patch_settlement(timer, settlement_fig, settlement_range(profiles))
+        else:
+            with stage('stress_change_figure'):
+                stress_change_fig = stress_change_figure(profiles, layers, scenario.total_depth)
+            stress_change_fig = send_figures(timer, stress_change_fig)[0]
 
-def update_graphs(n_clicks, sublayer_thickness, z1, z2, z3, water_table, a, b, q, gamma_1, gamma_r_1, gamma_2, gamma_r_2, 
-                   gamma_3, gamma_r_3, C_c_1, C_s_1, e_0_1, OCR_1, C_c_2, C_s_2, e_0_2, 
-                   OCR_2, C_c_3, C_s_3, e_0_3, OCR_3):
-    # Constants
-    gamma_water = 10 # kN/m³ for water
-    # total_settelment = 0
+    settelments = [f'{round(total_settelment, 2)}' for _, _, _, _, total_settelment in profiles]
+    return stress_change_fig, settelments[0], settelments[1], key
 
-    # total depth
-    total_depth = z1 + z2 + z3
 
-    # Ensure y_top has a default value
-    y_top = -0.1*total_depth
+def patch_settlement(timer, settlement_fig, xaxis2_range):
+    """Patch of the settlement traces and axis of a stress change figure.
+
+    Traces of stress_change_figure: stress and settlement of the preferred
+    sublayers, then of the reference sublayers, then the layer lines.
+    settlement_fig holds the two settlement traces only.
+    """
+    sent = send_figures(timer, settlement_fig)[0]
+    if not isinstance(sent, dict):
+        sent = sent.to_dict()
+    patch = dash.Patch()
+    for i, trace in zip((1, 3), sent['data']):
+        patch['data'][i]['x'] = trace['x']
+        patch['data'][i]['y'] = trace['y']
+    patch['layout']['xaxis2']['range'] = xaxis2_range
+    return patch
+
+
+@app.callback(
+    [Output('section-settlement-graph', 'figure'),
+     Output('section-summary', 'children')],
+    UPDATE_INPUTS,
+    [State(component_id, 'value') for component_id in STATE_IDS]
+)
+def update_section(n_clicks, live_request, *values):
+    live = live_key(live_request)
+    scenario = scenario_from_states(values)
+    a = scenario.a
+
+    with CallbackTimer('update_section') as timer:
+        stage = live_stage(timer, live)
+        with stage('contour'):
+            # The section is evaluated at the columns of the contour grid
+            section_x = np.asarray(cached_contour_trace(a, scenario.b, scenario.total_depth).x)
+        with stage('section_settlement'):
+            section = stored_section(scenario, section_x)
+            differential, angular_distortion = distortion(section_x, section, 1.5*a, 2.5*a)
+        with stage('section_figure'):
+            section_fig = section_settlement_figure(section_x, section, a)
+        section_fig = send_figures(timer, section_fig)[0]
+
+    summary = (f'Max differential settlement below the footing: {round(differential, 2)} mm, '
+               f'angular distortion: {f"1/{round(1 / angular_distortion)}" if angular_distortion > 0 else "0"}')
+    return section_fig, summary
+
+
+@app.callback(
+    Output('sett_quad', 'children'),
+    UPDATE_INPUTS,
+    [State(component_id, 'value') for component_id in STATE_IDS]
+)
+def update_quadrature(n_clicks, live_request, *values):
+    live = live_key(live_request)
+    scenario = scenario_from_states(values)
+    with CallbackTimer('update_quadrature') as timer:
+        with live_stage(timer, live)('quadrature'):
+            quadrature, quadrature_error, _ = calculate_quadrature(scenario)
+    return f'{round(quadrature, 2)} (± {quadrature_error:.1g})'
+
+
+def stored_section(scenario, x):
+    # Settlement along A-A of the preferred sublayers: tens of ms for thin sublayers, so it goes to the result store
+    a = scenario.a
+
+    def compute():
+        return {'settlement': calculate_section(scenario, scenario.sublayer_thickness, x, 1.5*a, 2.5*a)}
+
+    inputs = {'scenario': scenario.to_record(), 'x': x, 'version': ENGINE_VERSION}
+    return store.get_or_compute('section_settlement', inputs, compute)['settlement']
+
+
+def scenario_from_states(values):
+    # Scenario of the States of the main figures, in the order of STATE_IDS
+    if any(value is None for value in values):
+        raise PreventUpdate
+    return Scenario.from_record(dict(zip(STATE_IDS, values)), layer_count=SOIL_LAYERS)
+
+
+def job_callback(name, *args, **kwargs):
+    """app.callback of a long-running analysis, run as a background job when BACKGROUND_JOBS is on.
+
+    name is the prefix of the ids of the analysis button and its job_controls.
+    The function gets a progress callable for the calculations before the
+    callback arguments; it is None when the callback runs in the request.
+    """
+    def decorator(function):
+        if not BACKGROUND_JOBS:
+            @functools.wraps(function)
+            def callback(*values):
+                return function(None, *values)
+            return app.callback(*args, **kwargs)(callback)
+
+        @functools.wraps(function)
+        def job(set_progress, *values):
+            return function(progress_reporter(set_progress), *values)
+        return app.callback(
+            *args,
+            background=True,
+            interval=JOB_POLL_INTERVAL,
+            progress=[Output(f'{name}-progress', 'value'), Output(f'{name}-progress-label', 'children')],
+            progress_default=[0, ''],
+            running=[(Output(f'{name}-button', 'disabled'), True, False),
+                     (Output(f'{name}-cancel', 'disabled'), False, True)],
+            cancel=[Input(f'{name}-cancel', 'n_clicks')],
+            **kwargs,
+        )(job)
+    return decorator
+
+
+@job_callback(
+    'sweep',
+    Output('sweep-graph', 'figure'),
+    [Input('sweep-button', 'n_clicks')],
+    [State('sweep-x', 'value'),
+     State('sweep-x-from', 'value'),
+     State('sweep-x-to', 'value'),
+     State('sweep-y', 'value'),
+     State('sweep-y-from', 'value'),
+     State('sweep-y-to', 'value'),
+     State('sweep-points', 'value')] +
+    [State(component_id, 'value') for component_id in STATE_IDS],
+    prevent_initial_call=True,
+)
+def update_sweep(progress, n_clicks, x_name, x_from, x_to, y_name, y_from, y_to, points, *values):
+    if None in (x_from, x_to, y_from, y_to, points):
+        raise PreventUpdate
+    scenario = scenario_from_states(values)
+    points = int(min(max(points, 2), SWEEP_MAX_POINTS))
+    x_values = np.linspace(x_from, x_to, points)
+    y_values = np.linspace(y_from, y_to, points)
+
+    with CallbackTimer('update_sweep') as timer:
+        with timer.stage('sweep'):
+            try:
+                settlement = store.get_or_compute(
+                    'sweep',
+                    {'scenario': scenario.to_record(), 'x_name': x_name, 'x': x_values, 'y_name': y_name,
+                     'y': y_values, 'version': ENGINE_VERSION},
+                    lambda: {'settlement': sweep_settlement(scenario, x_name, x_values, y_name, y_values,
+                                                            progress=progress)})['settlement']
+            except ValueError as e:
+                return go.Figure(layout=dict(title=str(e), plot_bgcolor='white'))
+        with timer.stage('sweep_figure'):
+            figure = sweep_figure(x_name, x_values, y_name, y_values, settlement)
+        if COMPACT_PAYLOADS:
+            with timer.stage('payload'):
+                (figure,), _, after = compact_figures(figure.to_dict())
+            timer.extra['payload_bytes'] = after
+    return figure
+
+
+def sweep_figure(x_name, x_values, y_name, y_values, settlement):
+    labels = {option['value']: option['label'] for option in SWEEP_OPTIONS}
+    sweep_fig = go.Figure(go.Contour(
+        z=settlement,
+        x=x_values,
+        y=y_values,
+        colorscale='YlOrRd',
+        contours=dict(coloring='heatmap', showlabels=True),
+        colorbar=dict(title=dict(text='Δ𝜌<sub>E</sub> (mm)')),
+        hovertemplate=f'{labels[x_name]}: %{{x:.3f}}<br>{labels[y_name]}: %{{y:.3f}}<br>'
+                      'Settlement: %{z:.2f} mm<extra></extra>',
+    ))
+    sweep_fig.update_layout(
+        plot_bgcolor='white',
+        xaxis=dict(title=dict(text=labels[x_name], font=dict(weight='bold')), showline=True, linewidth=2, linecolor='black',
+                   ticks='outside', mirror=True),
+        yaxis=dict(title=dict(text=labels[y_name], font=dict(weight='bold')), showline=True, linewidth=2, linecolor='black',
+                   ticks='outside', mirror=True),
+        margin=dict(l=60, r=10, t=10, b=40),
+    )
+    return sweep_fig
+
+
+@job_callback(
+    'mc',
+    [Output('mc-graph', 'figure')] +
+    [Output(f'sett_p{p}', 'children') for p in MONTE_CARLO_PERCENTILES],
+    [Input('mc-button', 'n_clicks')],
+    [State('mc-distribution', 'value'),
+     State('mc-realizations', 'value')] +
+    [State(f'mc-cov-{name}', 'value') for name, _, _ in MONTE_CARLO_COV] +
+    [State(component_id, 'value') for component_id in STATE_IDS],
+    prevent_initial_call=True,
+)
+def update_monte_carlo(progress, n_clicks, distribution, realizations, *values):
+    covs, values = values[:len(MONTE_CARLO_COV)], values[len(MONTE_CARLO_COV):]
+    if realizations is None or None in covs:
+        raise PreventUpdate
+    scenario = scenario_from_states(values)
+    realizations = int(min(max(realizations, 1), MONTE_CARLO_MAX_REALIZATIONS))
+    cov = {name: value for (name, _, _), value in zip(MONTE_CARLO_COV, covs)}
+
+    with CallbackTimer('update_monte_carlo') as timer:
+        with timer.stage('monte_carlo'):
+            # The same inputs give the same draws again, from the result store
+            settlement = store.get_or_compute(
+                'monte_carlo',
+                {'scenario': scenario.to_record(), 'cov': cov, 'realizations': realizations,
+                 'distribution': distribution, 'version': ENGINE_VERSION},
+                lambda: {'settlement': monte_carlo_settlement(scenario, cov, realizations, distribution=distribution,
+                                                              progress=progress)})['settlement']
+            percentiles = np.percentile(settlement, MONTE_CARLO_PERCENTILES)
+        with timer.stage('monte_carlo_figure'):
+            figure = monte_carlo_figure(settlement, percentiles)
+        timer.extra['realizations'] = realizations
+
+    return figure, *[f'{round(value, 2)}' for value in percentiles]
+
+
+def monte_carlo_figure(settlement, percentiles):
+    # Binned on the server, so the payload does not grow with the number of realizations
+    counts, edges = np.histogram(settlement, bins=MONTE_CARLO_BINS)
+    mc_fig = go.Figure(go.Bar(
+        x=0.5 * (edges[:-1] + edges[1:]),
+        y=counts / len(settlement),
+        width=np.diff(edges),
+        marker=dict(color='green', line=dict(color='black', width=1)),
+        showlegend=False,
+        hovertemplate='Δ𝜌<sub>E</sub>: %{x:.2f} mm<br>Share: %{y:.3f}<extra></extra>',
+    ))
+    for p, value in zip(MONTE_CARLO_PERCENTILES, percentiles):
+        mc_fig.add_vline(x=value, line=dict(color='red', width=2, dash='dash'),
+                         annotation_text=f'P{p}= {round(value, 2)}', annotation_position='top')
+    mc_fig.update_layout(
+        plot_bgcolor='white',
+        bargap=0,
+        xaxis=dict(title=dict(text='Δ𝜌<sub>E</sub> (mm)', font=dict(weight='bold')), showline=True, linewidth=2,
+                   linecolor='black', ticks='outside', mirror=True),
+        yaxis=dict(title=dict(text='Share of realizations', font=dict(weight='bold')), showline=True, linewidth=2,
+                   linecolor='black', ticks='outside', mirror=True),
+        margin=dict(l=60, r=10, t=30, b=40),
+    )
+    return mc_fig
+
+
+@app.callback(
+    Output('footings-table', 'data'),
+    [Input('add-footing-button', 'n_clicks')],
+    [State('footings-table', 'data')],
+    prevent_initial_call=True,
+)
+def add_footing(n_clicks, rows):
+    return rows + [{'x': 0, 'y': 0, 'a': 2, 'b': 2, 'q': 100}]
+
+
+@app.callback(
+    Output('group-graph', 'figure'),
+    [Input('group-button', 'n_clicks')],
+    [State('footings-table', 'data'),
+     State('group-depth', 'value')],
+)
+def update_group(n_clicks, rows, depth):
+    if depth is None or depth <= 0:
+        raise PreventUpdate
+    try:
+        footings = [Footing(**{column: float(row[column]) for column, _ in FOOTING_COLUMNS}) for row in rows]
+    except (KeyError, TypeError, ValueError):
+        return go.Figure(layout=dict(title='Every footing needs a numeric x, y, a, b and q', plot_bgcolor='white'))
+    if not footings:
+        raise PreventUpdate
+
+    with CallbackTimer('update_group') as timer:
+        with timer.stage('group_stress'):
+            x0 = min(f.x - f.a / 2 for f in footings)
+            x1 = max(f.x + f.a / 2 for f in footings)
+            y0 = min(f.y - f.b / 2 for f in footings)
+            y1 = max(f.y + f.b / 2 for f in footings)
+            margin = depth + 0.25 * max(x1 - x0, y1 - y0)
+            x = np.linspace(x0 - margin, x1 + margin, GROUP_GRID_POINTS)
+            y = np.linspace(y0 - margin, y1 + margin, GROUP_GRID_POINTS)
+            stress = group_stress_change(footings, x[np.newaxis, :], y[:, np.newaxis], depth)
+        with timer.stage('group_figure'):
+            figure = group_figure(footings, x, y, stress, depth)
+        if COMPACT_PAYLOADS:
+            with timer.stage('payload'):
+                (figure,), _, after = compact_figures(figure.to_dict())
+            timer.extra['payload_bytes'] = after
+        timer.extra['footings'] = len(footings)
+    return figure
+
+
+def group_figure(footings, x, y, stress, depth):
+    group_fig = go.Figure(go.Contour(
+        z=stress,
+        x=x,
+        y=y,
+        colorscale='YlOrRd',
+        contours=dict(showlabels=True),
+        colorbar=dict(title=dict(text=f'Δσ<sub>z</sub> (kPa) at {depth} m')),
+        hovertemplate='x: %{x:.2f}<br>y: %{y:.2f}<br>Δσ<sub>z</sub>: %{z:.2f} kPa<extra></extra>',
+    ))
+    # Footing outlines as one trace; add_shape per footing is slow for large groups
+    outline_x = []
+    outline_y = []
+    for footing in footings:
+        x0, x1 = footing.x - footing.a / 2, footing.x + footing.a / 2
+        y0, y1 = footing.y - footing.b / 2, footing.y + footing.b / 2
+        outline_x += [x0, x1, x1, x0, x0, None]
+        outline_y += [y0, y0, y1, y1, y0, None]
+    group_fig.add_trace(go.Scatter(
+        x=outline_x,
+        y=outline_y,
+        mode='lines',
+        line=dict(color='black', width=2),
+        showlegend=False,
+        hoverinfo='skip'
+    ))
+    group_fig.update_layout(
+        plot_bgcolor='white',
+        xaxis=dict(title=dict(text='x (m)', font=dict(weight='bold')), showline=True, linewidth=2, linecolor='black',
+                   ticks='outside', mirror=True),
+        yaxis=dict(title=dict(text='y (m)', font=dict(weight='bold')), showline=True, linewidth=2, linecolor='black',
+                   ticks='outside', mirror=True, scaleanchor='x', scaleratio=1),
+        margin=dict(l=60, r=10, t=10, b=40),
+    )
+    return group_fig
+
+
+@job_callback(
+    'volume',
+    [Output('volume-key', 'data'),
+     Output('volume-depth', 'max'),
+     Output('volume-depth', 'marks')],
+    [Input('volume-button', 'n_clicks')],
+    [State('volume-plan-points', 'value'),
+     State('volume-depth-points', 'value')] +
+    [State(component_id, 'value') for component_id in STATE_IDS],
+    prevent_initial_call=True,
+)
+def update_volume(progress, n_clicks, plan_points, depth_points, *values):
+    if plan_points is None or depth_points is None:
+        raise PreventUpdate
+    scenario = scenario_from_states(values)
+    a, b, total_depth = scenario.a, scenario.b, scenario.total_depth
+    plan_points = int(min(max(plan_points, 2), VOLUME_MAX_PLAN_POINTS))
+    depth_points = int(min(max(depth_points, 2), VOLUME_MAX_DEPTH_POINTS))
+
+    # Same plan coordinates as the foundation figure: the footing spans 1.5a..2.5a x 0..b
+    footing = Footing(x=2*a, y=b/2, a=a, b=b, q=scenario.q)
+    x = np.linspace(0, 4*a, plan_points)
+    y = np.linspace(b/2 - 2*a, b/2 + 2*a, plan_points)
+    z = np.linspace(0, total_depth, depth_points + 1)[1:]
+
+    with CallbackTimer('update_volume') as timer:
+        with timer.stage('volume'):
+            key = compute_volume([footing], x, y, z, progress=progress)
+        timer.extra['points'] = plan_points**2 * depth_points
+
+    marks = {float(depth): f'{depth:g}' for depth in np.linspace(0, total_depth, 4).round(2)}
+    return key, total_depth, marks
+
 
-    # Define soil layers and their boundaries with specified patterns
-    layers = [
-        {'layer_id': '1', 'name': 'Layer 1', 'thickness' : z1,'top': 0, 'bottom': z1},  
-        {'layer_id': '2', 'name': 'Layer 2', 'thickness' : z2, 'top': z1, 'bottom': z1 + z2},  
-        {'layer_id': '3', 'name': 'Layer 3', 'thickness' : z3, 'top': z1 + z2, 'bottom': z1 + z2 + z3},  
+@app.callback(
+    Output('volume-graph', 'figure'),
+    [Input('volume-key', 'data'),
+     Input('volume-depth', 'value')],
+    prevent_initial_call=True,
+)
+def update_volume_slice(key, depth):
+    # The key comes from the browser, so it is checked before it names a file
+    if not is_volume_key(key) or depth is None:
+        raise PreventUpdate
+    with CallbackTimer('update_volume_slice') as timer:
+        with timer.stage('plan_slice'):
+            try:
+                x, y, slice_depth, stress = plan_slice(key, depth)
+            except KeyError:
+                # Evicted since it was computed; the volume button computes it again
+                raise PreventUpdate
+
+        with timer.stage('volume_figure'):
+            figure = plan_slice_figure(x, y, slice_depth, stress)
+        if COMPACT_PAYLOADS:
+            with timer.stage('payload'):
+                (figure,), _, after = compact_figures(figure.to_dict())
+            timer.extra['payload_bytes'] = after
+    return figure
+
+
+def plan_slice_figure(x, y, depth, stress):
+    volume_fig = go.Figure(go.Contour(
+        z=stress,
+        x=x,
+        y=y,
+        colorscale='YlOrRd',
+        contours=dict(showlabels=True),
+        colorbar=dict(title=dict(text=f'Δσ<sub>z</sub> (kPa) at {depth:.2f} m')),
+        hovertemplate='x: %{x:.2f}<br>y: %{y:.2f}<br>Δσ<sub>z</sub>: %{z:.2f} kPa<extra></extra>',
+    ))
+    volume_fig.update_layout(
+        plot_bgcolor='white',
+        xaxis=dict(title=dict(text='x (m)', font=dict(weight='bold')), showline=True, linewidth=2, linecolor='black',
+                   ticks='outside', mirror=True),
+        yaxis=dict(title=dict(text='y (m)', font=dict(weight='bold')), showline=True, linewidth=2, linecolor='black',
+                   ticks='outside', mirror=True, scaleanchor='x', scaleratio=1),
+        margin=dict(l=60, r=10, t=10, b=40),
+    )
+    return volume_fig
+
+
+def soil_layers(scenario):
+    # Boundaries of each soil layer, from the surface down
+    table = scenario.layer_table()
+    return [
+        {'layer_id': str(i), 'name': f'Layer {i}', 'thickness': layer.thickness, 'top': top, 'bottom': bottom}
+        for i, (layer, top, bottom) in enumerate(zip(scenario.layers, table.top.tolist(), table.bottom.tolist()), start=1)
     ]
 
-    # Create the soil layers figure (139,69,19)
-    foundation_fig = go.Figure()
-    soil_layers_fig = go.Figure()
-    stress_change_fig = go.Figure()
 
- 
+def point_e_profiles(scenario):
+    # (step, depths, stress_change, settelment, total_settelment) for the preferred and the reference sublayers
+    profiles = []
+    for step in (scenario.sublayer_thickness, REFERENCE_STEP):
+        if step == REFERENCE_STEP:
+            profiles.append((step, *reference_profile(scenario)))
+        else:
+            profiles.append((step, *calculate(scenario, step)))
+    return profiles
+
+
+# Static layouts of the main figures, validated by plotly once at import. A figure starts
+# from its layout and only sets the data-dependent axis ranges, instead of validating
+# the whole update_layout again on every call.
+FOUNDATION_LAYOUT = go.Layout(
+    plot_bgcolor='white',
+    dragmode=False,  # Disable zooming and panning
+    autosize=False,
+    xaxis=dict(
+        showticklabels=False,
+        title_standoff=4,
+        showgrid=False,
+        showline=False,
+        title=None,
+        zeroline=False,
+        fixedrange=True
+    ),
+    yaxis=dict(
+        showticklabels=False,
+        title_standoff=4,
+        showgrid=False,
+        showline=False,
+        title=None,
+        zeroline=False,
+        fixedrange=True,
+        scaleanchor="x",  # Link y-axis scaling with x-axis
+        scaleratio=1,
+    ),
+    margin=dict(l=60, r=40, t=10, b=10),
+)
+
+SOIL_LAYERS_LAYOUT = go.Layout(
+    plot_bgcolor='white',
+    xaxis=dict(
+        title=dict(text='Width (m)', font=dict(weight='bold')),
+        side = 'top',
+        title_standoff=4,
+        showticklabels=True,
+        ticks='outside',
+        ticklen=5,
+        minor_ticks="inside",
+        showline=True,
+        linewidth=2,
+        linecolor='black',
+        zeroline=False,
+        # scaleanchor="y",  # Link x and y axes scaling
+        # scaleratio=1,
+    ),
+    yaxis=dict(
+        title=dict(text='Depth (m)', font=dict(weight='bold')),
+        showticklabels=True,
+        ticks='outside',
+        title_standoff=4,
+        ticklen=5,
+        minor_ticks="inside",
+        showline=True,
+        linewidth=2,
+        linecolor='black',
+        zeroline=False,
+        # scaleanchor="x",  # Link y-axis scaling with x-axis
+        # scaleratio=1,
+    ),
+    margin=dict(l=30, r=10, t=10, b=20),
+)
+
+SECTION_LAYOUT = go.Layout(
+    plot_bgcolor='white',
+    xaxis=dict(
+        showticklabels=False,
+        showline=True,
+        linewidth=2,
+        linecolor='black',
+        zeroline=False,
+    ),
+    yaxis=dict(
+        title=dict(text='Δ𝜌<sub>A-A</sub> (mm)', font=dict(weight='bold')),
+        ticks='outside',
+        title_standoff=4,
+        ticklen=5,
+        showline=True,
+        linewidth=2,
+        linecolor='black',
+        zeroline=False,
+    ),
+    margin=dict(l=30, r=10, t=10, b=20),
+)
+
+STRESS_CHANGE_LAYOUT = go.Layout(
+    plot_bgcolor='white',
+    xaxis=dict(
+        title=dict(text='Δσ<sub>z,E</sub> (kPa)', font=dict(weight='bold')),
+        side='top',
+        title_standoff=4,
+        zeroline=False,
+        showticklabels=True,
+        ticks='outside',
+        ticklen=5,
+        minor_ticks="inside",
+        showline=True,
+        linewidth=2,
+        linecolor='black',
+        showgrid=False,
+        gridwidth=1,
+        gridcolor='lightgrey',
+        mirror=True,
+        hoverformat=".2f"  # Sets hover value format for x-axis to two decimal places
+    ),
+    xaxis2=dict(  # Second x-axis (Displacement)
+        title=dict(text='Δ𝜌<sub>z,E</sub> (mm)', font=dict(weight='bold')),
+        overlaying='x',  # Share the same space as the first x-axis
+        title_standoff=1,
+        side='top',   
+        anchor='free', 
+        showticklabels=True,
+        ticks='outside',
+        ticklen=3,
+        minor_ticks="inside",
+        showline=True,
+        linewidth=2,
+        linecolor='black',
+        showgrid=False,
+        gridwidth=1,
+        gridcolor='lightgrey',
+        mirror=True,
+        hoverformat=".2f",  # Sets hover value format for x-axis to two decimal places
+    ),
+    yaxis=dict(
+        title=dict(text='Depth (m)', font=dict(weight='bold')),
+        zeroline=False,
+        title_standoff=4,
+        showticklabels=True,
+        ticks='outside',
+        ticklen=5,
+        minor_ticks="inside",
+        showline=True,
+        linewidth=2,
+        linecolor='black',
+        showgrid=False,
+        gridwidth=1,
+        gridcolor='lightgrey',
+        mirror=True,
+        hoverformat=".2f"  # Sets hover value format for y-axis to two decimal places
+    ),
+    legend=dict(
+        yanchor="bottom",  # Align the bottom of the legend box
+        y=0,               # Position the legend at the bottom inside the plot
+        xanchor="right",    # Align the right edge of the legend box
+        x=1,               # Position the legend at the right inside the plot
+        font= dict(size=9),  # Adjust font size
+        bgcolor="rgba(255, 255, 255, 0.7)",  # Optional: Semi-transparent white background
+        bordercolor="black",                 # Optional: Border color
+        borderwidth=1                        # Optional: Border width
+    ),
+    margin=dict(l=30, r=10, t=10, b=20),
+)
+
+
+def foundation_figure(a, b):
+    foundation_fig = go.Figure(layout=FOUNDATION_LAYOUT)
+
     # add top view dimension scaled to 0-1
     x0_dim = 2*a - a/2
     y0_dim = 0
@@ -543,7 +1427,22 @@ def update_graphs(n_clicks, sublayer_thickness, z1, z2, z3, water_table, a, b, q
         yanchor='bottom'  # Align the text to appear above the line
     )
 
-    
+    # Same x-range as the soil layers figure
+    x_range = [0, 4*a]
+
+    foundation_fig.layout.xaxis.range = x_range  # Same x-range as soil_layers_fig
+    foundation_fig.layout.yaxis.range = [0, a]
+    return foundation_fig
+
+
+def soil_layers_figure(layers, total_depth, water_table, a, b, contour_trace):
+    soil_layers_fig = go.Figure(layout=SOIL_LAYERS_LAYOUT)
+
+    x0_dim = 2*a - a/2
+    x1_dim = 2*a + a/2
+    # Ensure y_top has a default value
+    y_top = -0.1*total_depth
+
     for layer in layers:
         if layer['thickness'] > 0:
             # Add a line at the top and bottom of each layer
@@ -556,7 +1455,7 @@ def update_graphs(n_clicks, sublayer_thickness, z1, z2, z3, water_table, a, b, q
                 hoverinfo='skip'  # Skip the hover info for these lines
             ))
             
-    # horizantal line at the bottonm of the third layer
+    # horizantal line at the bottonm of the last layer
     soil_layers_fig.add_trace(go.Scatter(
         x=[0, 4*a],  # Start at -1 and end at 1
         y=[total_depth, total_depth],  
@@ -576,24 +1475,21 @@ def update_graphs(n_clicks, sublayer_thickness, z1, z2, z3, water_table, a, b, q
         hoverinfo='skip'  # Skip the hover info for these line
     )) 
 
-    # adding arrowas distributed load on the foundation
-    num_arrows = a//0.5
-    for i in range(0, int(num_arrows+1)):
-        soil_layers_fig.add_annotation(
-            x=x0_dim + i*0.5, # x-coordinate of arrow head
-            y=0, # y-coordinate of arrow head
-            ax=x0_dim + i*0.5, # x-coordinate of tail
-            ay=y_top, # y-coordinate of tail
-            xref="x",
-            yref="y",
-            axref="x",
-            ayref="y",
-            showarrow=True,
-            arrowhead=2,
-            arrowsize=1,
-            arrowwidth=2,
-            arrowcolor="black"
-        )
+    # adding arrowas distributed load on the foundation, one every 0.5 m, all in one trace:
+    # tail, head and a gap for each arrow, with an arrow marker at the head only
+    num_arrows = int(a//0.5) + 1
+    arrow_x = np.repeat(x0_dim + 0.5*np.arange(num_arrows), 3).astype(object)
+    arrow_x[2::3] = None
+    arrow_y = np.tile(np.array([y_top, 0, None], dtype=object), num_arrows)
+    soil_layers_fig.add_trace(go.Scatter(
+        x=arrow_x,
+        y=arrow_y,
+        mode='lines+markers',
+        line=dict(color='black', width=2),
+        marker=dict(symbol='arrow', angleref='previous', color='black', size=np.tile([0, 10, 0], num_arrows)),
+        showlegend=False,
+        hoverinfo='skip'
+    ))
 
     soil_layers_fig.add_trace(go.Scatter(
         x=[x0_dim, x1_dim],  
@@ -624,280 +1520,52 @@ def update_graphs(n_clicks, sublayer_thickness, z1, z2, z3, water_table, a, b, q
         yanchor='bottom'  # Align the text to appear above the line
     )
     
-    # Add the soil layers to the figure
-
-    x_1 = np.arange(start=x0_dim - 1.5*a, stop=x0_dim - 0.5*a, step=0.2*a)
-    x_2 = np.arange(start=x0_dim - 0.5*a, stop=x1_dim + 0.5*a, step=0.01*a)
-    x_3 = np.arange(start=x1_dim + 0.5*a, stop=x1_dim + 1.5*a, step=0.2*a)
-
-    if total_depth > 3*a:
-        z_1 = np.arange(start=0.000000001, stop=3*a, step=0.01*a)
-        z_2 = np.arange(start=3*a, stop=total_depth, step=0.2*a)
-    else:
-        z_1 = np.arange(start=0.000000001, stop=total_depth, step=0.01*a)
-        z_2 = []
-
-    x= np.concatenate([x_1, x_2, x_3])
-    z = np.concatenate([z_1, z_2])
-    X, Z = np.meshgrid(x, z)
-
-    # Initialize I as an array filled with zeros
-    I = np.zeros_like(X)
-
-    b1 = b2 = b / 2
-
-    for i, x_val in enumerate(x):
-        
-        if x_val <= x0_dim:
-            a1 = x1_dim - x_val
-            a2 = x0_dim - x_val
-        elif x_val >= x1_dim:
-            a1 = x_val - x0_dim
-            a2 = x_val - x1_dim
-        else:
-            a1 = x1_dim - x_val
-            a2 = x_val - x0_dim
+    # Add the contour trace to the figure
+    soil_layers_fig.add_trace(contour_trace)
 
-        R1 = np.sqrt(a1**2 + b1**2 + Z**2)
-        R2 = np.sqrt(a2**2 + b2**2 + Z**2)
+    
+    soil_layers_fig.layout.xaxis.range = [0, 4*a]
+    soil_layers_fig.layout.yaxis.range = [total_depth, y_top]  # inverted for depth
+    return soil_layers_fig
 
-        I1 = (1 / (2 * np.pi)) * (
-            (np.arctan((a1 * b1) / (R1 * Z))) + (((a1 * b1 * Z) / R1) * ((1 / ((a1**2) + (Z**2))) + (1 / ((b1**2) + (Z**2)))))
-        )
-        I2 = (1 / (2 * np.pi)) * (
-            (np.arctan((a2 * b2) / (R2 * Z))) + (((a2 * b2 * Z) / R2) * ((1 / ((a2**2) + (Z**2))) + (1 / ((b2**2) + (Z**2)))))
-        )
 
-        if x_val <= x0_dim or x_val >= x1_dim:
-            I[:, i] = 2 * I1[:, i] - 2 * I2[:, i]  # Adjust to take the i-th column slice if needed
-        else:
-            I[:, i] = 2 * I1[:, i] + 2 * I2[:, i]  # Adjust to take the i-th column slice if needed
+def section_settlement_figure(x, settlement, a):
+    section_fig = go.Figure(layout=SECTION_LAYOUT)
+    x0_dim = 2*a - a/2
+    x1_dim = 2*a + a/2
 
-    # Ensure I has no negative values
-    I = np.where(I < 0, 0, I)
-        
-    # Create the contour trace with only lines and no color fill
-    contour_trace = go.Contour(
-        z=I,
+    section_fig.add_trace(go.Scatter(
         x=x,
-        y=z,
-        contours=dict(
-            start=0,
-            end=0.9,
-            size=0.1,
-            showlabels=True,
-            # labelfont=dict(size=12, color='black')  # Ensures labels are visible
-        ),
-        colorscale='YlOrRd',  # Use 'Cividis' or 'Plasma' for alternatives
-        showscale=False,
+        y=settlement,
+        mode='lines',
+        line=dict(color='green', width=3),
         showlegend=False,
-        hovertemplate='J: %{z:.3f}<br>x: %{x:.3f}<br>y: %{y:.3f}<extra></extra>'
-    )
-
-    # Add the contour trace to the figure
-    soil_layers_fig.add_trace(contour_trace)
-
-    
-    # First figure (soil_layers_fig)
-    soil_layers_fig.update_layout(
-        plot_bgcolor='white',
-        xaxis_title= dict(text='Width (m)', font=dict(weight='bold')),
-        xaxis=dict(
-            range=[0, 4*a],  # Adjusting the x-range as needed
-            side = 'top',
-            title_standoff=4,
-            showticklabels=True,
-            ticks='outside',
-            ticklen=5,
-            minor_ticks="inside",
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            zeroline=False,
-            # scaleanchor="y",  # Link x and y axes scaling
-            # scaleratio=1,
-        ),
-        yaxis_title= dict(text='Depth (m)', font=dict(weight='bold')),
-        yaxis=dict(
-            range=[total_depth, y_top],  # Adjusted range for the y-axis (inverted for depth)
-            showticklabels=True,
-            ticks='outside',
-            title_standoff=4,
-            ticklen=5,
-            minor_ticks="inside",
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            zeroline=False,
-            # scaleanchor="x",  # Link y-axis scaling with x-axis
-            # scaleratio=1,
-        ),
-        margin=dict(l=30, r=10, t=10, b=20),
-    )
-
-    # Get the x-axis range from the first figure
-    x_range = soil_layers_fig.layout.xaxis.range
+        hovertemplate='x: %{x:.2f} m<br>Δ𝜌: %{y:.2f} mm<extra></extra>'
+    ))
 
-    # Second figure (foundation_fig)
-    foundation_fig.update_layout(
-        plot_bgcolor='white',
-        dragmode=False,  # Disable zooming and panning
-        autosize=False,
-        xaxis=dict(
-            range=x_range,  # Set the same x-range as soil_layers_fig
-            showticklabels=False,
-            title_standoff=4,
-            showgrid=False,
-            showline=False,
-            title=None,
-            zeroline=False,
-            fixedrange=True
-        ),
-        yaxis=dict(
-            range=[0, a],  # Adjusted range for the y-axis in this figure
-            showticklabels=False,
-            title_standoff=4,
-            showgrid=False,
-            showline=False,
-            title=None,
-            zeroline=False,
-            fixedrange=True,
-            scaleanchor="x",  # Link y-axis scaling with x-axis
-            scaleratio=1,
-        ),
-        margin=dict(l=60, r=40, t=10, b=10),
-    )
+    # Edges of the footing
+    for x_edge in (x0_dim, x1_dim):
+        section_fig.add_trace(go.Scatter(
+            x=[x_edge, x_edge],
+            y=[0, 1.1 * max(settlement)],
+            mode='lines',
+            line=dict(color='black', width=1, dash='dash'),
+            showlegend=False,
+            hoverinfo='skip'
+        ))
 
-    # Third figure (stress_change_fig)
-    
-    def stress_change_and_settelment(step):
-        # Define depths array
-        depths_z1 = np.arange(start=step / 2, stop=int(z1 / step) * step , step=step)
-        # Modify depths array for the first layer (z1)
-        if (z1 / step) % 1 != 0:  # Check if z1/step is not an integer
-            remaining_thickness1 = z1 - (depths_z1[-1] + step / 2)
-            depths_z1 = np.append(depths_z1, int(z1 / step) * step +  remaining_thickness1 / 2)
-        
+    section_fig.layout.xaxis.range = [0, 4*a]  # Same x-range as soil_layers_fig
+    section_fig.layout.yaxis.range = [1.1 * max(settlement), 0]  # settlement drawn downwards
+    return section_fig
 
 
-        depths_z2 = np.arange(start=z1 + step / 2, stop=z1+int(z2 / step) * step , step=step)
-        # Modify depths array for the second layer (z2)
-        if (z2 / step) % 1 != 0:  # Check if z2/step is not an integer
-            remaining_thickness2 = z1+ z2 - (depths_z2[-1] - step / 2)
-            depths_z2 = np.append(depths_z2, depths_z2[-1] +  remaining_thickness2 / 2)
-               
-        depths_z3 = np.arange(start=z1+z2+step / 2, stop=z1+z2+int(z3 / step) * step, step=step)
-        # Modify depths array for the third layer (z3)
-        if (z3 / step) % 1 != 0:  # Check if z3/step is not an integer
-            remaining_thickness3 = z1 + z2 + z3 - (depths_z3[-1] - step / 2)
-            depths_z3 = np.append(depths_z3, depths_z3[-1] +  remaining_thickness3 / 2)
-
-        # Initialize stress_change and settelment arrays
-        all_depths = np.concatenate([depths_z1, depths_z2, depths_z3])
-        depths = np.sort(all_depths)[::-1]
-        stress_change = np.zeros_like(depths)
-        settelment = np.zeros_like(depths)
-
-        # Calculate change in stress based on the conditions
-        for i, depth in enumerate(depths):
-            # Calculate I for each depth
-            a_E = a / 2
-            b_E = b / 2
-            R = np.sqrt(a_E**2 + b_E**2 + depth**2)
-            I = (1 / (2 * np.pi)) * (
-                (np.arctan((a_E * b_E) / (R * depth))) +
-                (((a_E * b_E * depth) / R) * ((1 / ((a_E**2) + (depth**2))) + (1 / ((b_E**2) + (depth**2)))))
-            )
-            stress_change[i] = 4 * I * q
-
-        # Settlement calculations per depth level under point E
-        sigma_i = np.zeros_like(depths)
-        sigma_f = np.zeros_like(depths)
-        sigma_p = np.zeros_like(depths)
-        
+def stress_change_figure(profiles, layers, total_depth):
+    stress_change_fig = go.Figure(layout=STRESS_CHANGE_LAYOUT)
+    y_top = -0.1*total_depth
 
-           
-        # OCR = sigma_c / sigma_i
-        for i, depth in enumerate(depths):
-            if depth <= z1:
-                if depth <= water_table:
-                    sigma_i[i] = depth * gamma_1
-                else:
-                    sigma_i[i] = water_table * gamma_1 + (depth - water_table) * (gamma_r_1 - gamma_water)
-
-                sigma_f[i] = sigma_i[i] + stress_change[i]
-                sigma_p[i] = OCR_1 * sigma_i[i]
-
-                if OCR_1 == 1:
-                    delta_settlement = 1000 * (step / (1 + e_0_1)) * C_c_1 * np.log10(sigma_f[i] / sigma_i[i])
-                elif OCR_1 > 1 and sigma_f[i] <= sigma_p[i]:
-                    delta_settlement = 1000 * (step / (1 + e_0_1)) * C_s_1 * np.log10(sigma_f[i] / sigma_i[i])
-                elif OCR_1 > 1 and sigma_f[i] > sigma_p[i]:
-                    delta_settlement = 1000 * (step / (1 + e_0_1)) * (
-                        (C_s_1 * np.log10(sigma_p[i] / sigma_i[i])) +
-                        (C_c_1 * np.log10(sigma_f[i] / sigma_p[i]))
-                    )
-            elif depth > z1 and depth <= z1 + z2:
-                if water_table > z1:
-                    if depth <= water_table:
-                        sigma_i[i] = z1*gamma_1 + (depth - z1) * gamma_2
-                    else:
-                        sigma_i[i] = z1*gamma_1 + (water_table-z1)*gamma_2  + (depth - water_table) * (gamma_r_2 - gamma_water)
-                else:
-                    sigma_i[i] = water_table * gamma_1 + (z1 - water_table) * (gamma_r_1 - gamma_water) + (depth - z1) * (gamma_r_2 - gamma_water)
-
-                sigma_f[i] = sigma_i[i] + stress_change[i]
-                sigma_p[i] = OCR_2 * sigma_i[i]
-
-
-                if OCR_2 == 1:
-                    delta_settlement = 1000 * (step / (1 + e_0_2)) * C_c_2 * np.log10(sigma_f[i] / sigma_i[i])
-                elif OCR_2 > 1 and sigma_f[i] <= sigma_p[i]:
-                    delta_settlement = 1000 * (step / (1 + e_0_2)) * C_s_2 * np.log10(sigma_f[i] / sigma_i[i])
-                elif OCR_2 > 1 and sigma_f[i] > sigma_p[i]:
-                    delta_settlement = 1000 * (step / (1 + e_0_2)) * (
-                        (C_s_2 * np.log10(sigma_p[i] / sigma_i[i])) +
-                        (C_c_2 * np.log10(sigma_f[i] / sigma_p[i]))
-                    )
-
-            else:
-                if water_table > z1+z2:
-                    if depth <= water_table:
-                        sigma_i[i] = z1*gamma_1 + z2*gamma_2 + (depth - z1 - z2) * gamma_3
-                    else:
-                        sigma_i[i] = z1*gamma_1 + z2*gamma_2 + (water_table - z1 - z2) * gamma_3 + (depth - water_table) * (gamma_r_3 - gamma_water)
-                elif water_table > z1 and water_table <= z1+z2:
-                    sigma_i[i] = z1*gamma_1 + (water_table-z1)*gamma_2 + (z1+z2-water_table)*(gamma_r_2-gamma_water) +(depth - z1 - z2) * (gamma_r_3 - gamma_water)
-                else:
-                    sigma_i[i] = water_table * gamma_1 + (z1 - water_table) * (gamma_r_1 - gamma_water) + z2 * (gamma_r_2-gamma_water) + (depth - z1 - z2) * (gamma_r_3 - gamma_water)
-
-
-                sigma_f[i] = sigma_i[i] + stress_change[i]
-                sigma_p[i] = OCR_3 * sigma_i[i]
-
-                if OCR_3 == 1:
-                    delta_settlement = 1000 * (step / (1 + e_0_3)) * C_c_3 * np.log10(sigma_f[i] / sigma_i[i])
-                elif OCR_3 > 1 and sigma_f[i] <= sigma_p[i]:
-                    delta_settlement = 1000 * (step / (1 + e_0_3)) * C_s_3 * np.log10(sigma_f[i] / sigma_i[i])
-                elif OCR_3 > 1 and sigma_f[i] > sigma_p[i]:
-                    delta_settlement = 1000 * (step / (1 + e_0_3)) * (
-                        (C_s_3 * np.log10(sigma_p[i] / sigma_i[i])) +
-                        (C_c_3 * np.log10(sigma_f[i] / sigma_p[i]))
-                    )
-            # Update cumulative settlement
-            settelment[i] = delta_settlement + (settelment[i-1] if i > 0 else 0)
-
-            # Total settlement is the final cumulative value
-            total_settelment = settelment[-1]
-
-        return depths, stress_change, settelment, total_settelment
-
-    # Initialize the total settlement list
-    settelments = []
     # Add the stress change and settlement traces to the figure
-    for i, step in enumerate((sublayer_thickness, 0.05)):
-        depths, stress_change, settelment, total_settelment = stress_change_and_settelment(step)
-        if step != 0.05:
+    for step, depths, stress_change, settelment, total_settelment in profiles:
+        if step != REFERENCE_STEP:
             dashed = 'dash'
             mode = 'lines+markers'
         else:
@@ -915,25 +1583,8 @@ def update_graphs(n_clicks, sublayer_thickness, z1, z2, z3, water_table, a, b, q
         ))
 
         # Draw settlement with depth under point E
-        stress_change_fig.add_trace(go.Scatter(
-            x=settelment,
-            y=depths,
-            mode=mode,
-            # line_shape='vhv',
-            xaxis='x2',
-            line=dict(color='green', width=3, dash=dashed),
-            name='Settlement, Δ𝜌<sub>z,E</sub>, sublayer thickness = '+str(step)+'m',
-            showlegend=True,
-        )) 
-
-        # Append the total settlement to the list
-        if step == 0.05:
-            settelments.append( f'{round(total_settelment, 2)}')
-        else:
-            settelments.append( f'{round(total_settelment, 2)}')
+        stress_change_fig.add_trace(settlement_trace(step, depths, settelment))
 
-
-            
     for layer in layers:
         if layer['thickness'] > 0:
             # Add a line at the bottom of each layer other graph
@@ -946,10 +1597,10 @@ def update_graphs(n_clicks, sublayer_thickness, z1, z2, z3, water_table, a, b, q
                 hoverinfo='skip'  # Skip the hover info for these line
             ))
     
-    # horizantal line at the bottonm of the third layer
+    # horizantal line at the bottonm of the last layer
     stress_change_fig.add_trace(go.Scatter(
         x=[0, 1.2 * max(stress_change)],  # Start at -1 and end at 1
-        y=[z1 + z2 + z3, z1 + z2 + z3],  # Horizontal line at the top of the layer
+        y=[total_depth, total_depth],  # Horizontal line at the top of the layer
         mode='lines',
         line=dict(color='black', width=1, dash='dash'),
         showlegend=False,  # Hide legend for these lines
@@ -959,86 +1610,53 @@ def update_graphs(n_clicks, sublayer_thickness, z1, z2, z3, water_table, a, b, q
 
 
 
-    stress_change_fig.update_layout(
-        xaxis_title=dict(text='Δσ<sub>z,E</sub> (kPa)', font=dict(weight='bold')),
-        plot_bgcolor='white',
-        xaxis=dict(
-            range=[0, 1.2 * max(stress_change)],
-            side='top',
-            title_standoff=4,
-            zeroline=False,
-            showticklabels=True,
-            ticks='outside',
-            ticklen=5,
-            minor_ticks="inside",
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            showgrid=False,
-            gridwidth=1,
-            gridcolor='lightgrey',
-            mirror=True,
-            hoverformat=".2f"  # Sets hover value format for x-axis to two decimal places
-        ),
-        xaxis2=dict(  # Second x-axis (Displacement)
-            title=dict(text='Δ𝜌<sub>z,E</sub> (mm)', font=dict(weight='bold')),
-            overlaying='x',  # Share the same space as the first x-axis
-            title_standoff=1,
-            side='top',   
-            position = ((total_depth)/(total_depth-y_top)), 
-            anchor='free', 
-            showticklabels=True,
-            ticks='outside',
-            ticklen=3,
-            minor_ticks="inside",
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            showgrid=False,
-            gridwidth=1,
-            gridcolor='lightgrey',
-            mirror=True,
-            hoverformat=".2f",  # Sets hover value format for x-axis to two decimal places
-            range=[0,  1.4* max(settelment)],  # Match the range of the first x-axis
-        ),
-        yaxis_title=dict(text='Depth (m)', font=dict(weight='bold')),
-        yaxis=dict(
-            range=[total_depth, y_top],
-            zeroline=False,
-            title_standoff=4,
-            showticklabels=True,
-            ticks='outside',
-            ticklen=5,
-            minor_ticks="inside",
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            showgrid=False,
-            gridwidth=1,
-            gridcolor='lightgrey',
-            mirror=True,
-            hoverformat=".2f"  # Sets hover value format for y-axis to two decimal places
-        ),
-        legend=dict(
-            yanchor="bottom",  # Align the bottom of the legend box
-            y=0,               # Position the legend at the bottom inside the plot
-            xanchor="right",    # Align the right edge of the legend box
-            x=1,               # Position the legend at the right inside the plot
-            font= dict(size=9),  # Adjust font size
-            bgcolor="rgba(255, 255, 255, 0.7)",  # Optional: Semi-transparent white background
-            bordercolor="black",                 # Optional: Border color
-            borderwidth=1                        # Optional: Border width
-        ),
-        margin=dict(l=30, r=10, t=10, b=20),
+    stress_change_fig.layout.xaxis.range = [0, 1.2 * max(stress_change)]
+    stress_change_fig.layout.xaxis2.position = total_depth/(total_depth - y_top)
+    stress_change_fig.layout.xaxis2.range = settlement_range(profiles)
+    stress_change_fig.layout.yaxis.range = [total_depth, y_top]
+    return stress_change_fig
+
+
+def settlement_trace(step, depths, settelment):
+    if step != REFERENCE_STEP:
+        dashed = 'dash'
+        mode = 'lines+markers'
+    else:
+        dashed = 'solid'
+        mode = 'lines'
+    return go.Scatter(
+        x=settelment,
+        y=depths,
+        mode=mode,
+        # line_shape='vhv',
+        xaxis='x2',
+        line=dict(color='green', width=3, dash=dashed),
+        name='Settlement, Δ𝜌<sub>z,E</sub>, sublayer thickness = '+str(step)+'m',
+        showlegend=True,
     )
-    
 
 
-    return foundation_fig, soil_layers_fig, stress_change_fig, settelments[0], settelments[1]
-# Run the Dash app
-if __name__ == '__main__':
-    app.run_server(debug=True)
-    
+def settlement_range(profiles):
+    # Range of the settlement axis, from the reference sublayers drawn last
+    settelment = profiles[-1][3]
+    return [0, 1.4 * float(max(settelment))]
+
 
 # Expose the server
 server = app.server
+
+# JSON API of the calculations, under /api/v1
+server.register_blueprint(api)
+
+
+# Stage timings, call counters and cache hit rates of this worker, for local scraping only
+@server.route('/metrics')
+def metrics_endpoint():
+    if flask.request.remote_addr not in ('127.0.0.1', '::1'):
+        flask.abort(404)
+    return flask.Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+# Run the Dash app
+if __name__ == '__main__':
+    app.run_server(debug=True)
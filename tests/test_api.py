@@ -0,0 +1,103 @@
+import json
+import time
+
+import flask
+import pytest
+
+import api
+from calculations import MAX_LAYERS, Scenario, calculate
+
+
+@pytest.fixture
+def client():
+    app = flask.Flask(__name__)
+    app.register_blueprint(api.api)
+    return app.test_client()
+
+
+def test_default_scenario(client):
+    response = client.get('/api/v1/scenario')
+    assert response.status_code == 200
+    assert response.get_json() == Scenario().to_record()
+
+
+def test_single_scenario(client):
+    response = client.post('/api/v1/settlement?profiles=0', json={'id': 'E', 'q': 50})
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['id'] == 'E'
+    assert result['total_settelment_pref'] == round(float(calculate(Scenario(q=50), 1)[3]), 2)
+    assert 'profile_pref' not in result
+
+
+@pytest.mark.parametrize('record, message', [
+    ({'a': -4}, 'footing'),
+    ({'b': 0}, 'footing'),
+    ({'e_0_1': -1}, 'e_0_1'),
+    ({'OCR_2': 0.5}, 'OCR_2'),
+    ({'gamma_r_3': 0}, 'unit weights'),
+    ({'a': 'nan'}, 'finite'),
+    ({'input-factor': 0}, 'input-factor'),
+    ({'z-1': 0.01}, 'sublayer'),
+    ({'color': 'red'}, 'Unknown'),
+    ({f'OCR_{MAX_LAYERS + 1}': 1}, 'layers'),
+])
+def test_invalid_scenario(client, record, message):
+    response = client.post('/api/v1/settlement', json=record)
+    assert response.status_code == 400
+    assert message in response.get_json()['error']
+
+
+def test_many_layers_are_rejected_quickly(client):
+    start = time.perf_counter()
+    response = client.post('/api/v1/settlement', json={'OCR_1000000': 1})
+    assert response.status_code == 400
+    assert time.perf_counter() - start < 1
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_non_finite_settlement_is_an_error(client):
+    response = client.post('/api/v1/settlement', json={'q': -100})
+    assert response.status_code == 400
+    assert 'finite' in response.get_json()['error']
+    assert 'NaN' not in response.get_data(as_text=True)
+
+
+def test_batch_keeps_order_and_reports_errors(client):
+    records = [{'q': 50}, {'a': -1}, 'not an object', {'id': 'last', 'a': 10}]
+    response = client.post('/api/v1/settlement?profiles=0', json=records)
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['id'] for result in results] == ['0', '1', '2', 'last']
+    assert ['error' in result for result in results] == [False, True, True, False]
+    assert results[3]['total_settelment_ref'] == round(float(calculate(Scenario(a=10), 0.05)[3]), 2)
+
+
+def test_json_batch_limit(client, monkeypatch):
+    monkeypatch.setattr(api, 'API_MAX_JSON_BATCH', 3)
+    assert client.post('/api/v1/settlement', json=[{}] * 3).status_code == 200
+    response = client.post('/api/v1/settlement', json=[{}] * 4)
+    assert response.status_code == 413
+    assert api.NDJSON in response.get_json()['error']
+    # Streamed, the same batch is accepted
+    assert client.post('/api/v1/settlement?stream=1', json=[{}] * 4).status_code == 200
+
+
+def test_batch_limit(client, monkeypatch):
+    monkeypatch.setattr(api, 'API_MAX_BATCH', 3)
+    assert client.post('/api/v1/settlement?stream=1', json=[{}] * 4).status_code == 413
+
+
+@pytest.mark.parametrize('query, headers', [('?stream=1', {}), ('', {'Accept': api.NDJSON})])
+def test_ndjson_stream(client, monkeypatch, query, headers):
+    monkeypatch.setattr(api, 'API_STREAM_CHUNK', 2)
+    records = [{'q': 50 + 10 * i} for i in range(5)] + [{'a': 0}]
+    response = client.post(f'/api/v1/settlement{query}', json=records, headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == api.NDJSON
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['id'] for line in lines] == [str(i) for i in range(6)]
+    assert 'error' in lines[-1]
+    for line, record in zip(lines, records[:-1]):
+        assert line['total_settelment_pref'] == round(float(calculate(Scenario(**record), 1)[3]), 2)
+        assert len(line['profile_pref']['depths']) == 12
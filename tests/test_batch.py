@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+import batch
+
+
+def strict_json(line):
+    # json.loads accepts NaN and Infinity, JSONL readers do not
+    def reject(constant):
+        raise ValueError(f'{constant} is not JSON')
+    return json.loads(line, parse_constant=reject)
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_bad_rows_do_not_stop_the_run(tmp_path):
+    source = tmp_path / 'scenarios.jsonl'
+    source.write_text('\n'.join([
+        '{"id": "ok", "q": 50}',
+        'not json',
+        '[1, 2]',
+        '{"input-factor": 0}',
+        '{"q": -100}',
+        '{"e_0_1": -1}',
+        '{"OCR_1000000": 1}',
+        '{"id": "last"}',
+    ]) + '\n', encoding='utf-8')
+    output = tmp_path / 'results.jsonl'
+
+    assert batch.main([str(source), '-o', str(output)]) == 1
+    results = [strict_json(line) for line in output.read_text(encoding='utf-8').splitlines()]
+    assert [result['id'] for result in results] == ['ok', '1', '2', '3', '4', '5', '6', 'last']
+    assert ['error' in result for result in results] == [False] + [True] * 6 + [False]
+
+
+def test_csv_rows(tmp_path):
+    source = tmp_path / 'scenarios.csv'
+    source.write_text('id,a,input-factor\nA,4,1\nB,4,0\n', encoding='utf-8')
+    output = tmp_path / 'results.csv'
+
+    assert batch.main([str(source), '-o', str(output)]) == 1
+    header, first, second = output.read_text(encoding='utf-8').splitlines()
+    assert header.split(',') == batch.SUMMARY_FIELDS
+    assert first.startswith('A,') and first.endswith(',')
+    assert second.startswith('B,') and 'input-factor must be positive' in second
@@ -0,0 +1,262 @@
+"""Regression tests of the NumPy settlement engine against the loops it replaced.
+
+baseline_profile is the per-depth branches of the original
+stress_change_and_settelment, with the three-layer inputs taken from a
+Scenario; calculate and the batched paths built on it must give the same
+numbers. Profiles of more layers are checked against the same soil split
+into identical layers.
+"""
+import dataclasses
+
+import numpy as np
+import pytest
+
+from calculations import (DEFAULT_LAYERS, Footing, Layer, Scenario, batch_profiles, calculate, calculate_section,
+                          group_stress_change, monte_carlo_settlement, point_e_stress_change, rectangle_influence, sweep_settlement)
+
+RTOL = 1e-9
+
+
+def baseline_profile(scenario, step):
+    s = scenario
+    water_table, a, b, q = s.water_table, s.a, s.b, s.q
+    (z1, gamma_1, gamma_r_1, C_c_1, C_s_1, e_0_1, OCR_1), \
+        (z2, gamma_2, gamma_r_2, C_c_2, C_s_2, e_0_2, OCR_2), \
+        (z3, gamma_3, gamma_r_3, C_c_3, C_s_3, e_0_3, OCR_3) = (dataclasses.astuple(layer) for layer in s.layers)
+    gamma_water = 10
+
+    depths_z1 = np.arange(start=step / 2, stop=int(z1 / step) * step, step=step)
+    if (z1 / step) % 1 != 0:
+        remaining_thickness1 = z1 - (depths_z1[-1] + step / 2)
+        depths_z1 = np.append(depths_z1, int(z1 / step) * step + remaining_thickness1 / 2)
+    depths_z2 = np.arange(start=z1 + step / 2, stop=z1+int(z2 / step) * step, step=step)
+    if (z2 / step) % 1 != 0:
+        remaining_thickness2 = z1 + z2 - (depths_z2[-1] - step / 2)
+        depths_z2 = np.append(depths_z2, depths_z2[-1] + remaining_thickness2 / 2)
+    depths_z3 = np.arange(start=z1+z2+step / 2, stop=z1+z2+int(z3 / step) * step, step=step)
+    if (z3 / step) % 1 != 0:
+        remaining_thickness3 = z1 + z2 + z3 - (depths_z3[-1] - step / 2)
+        depths_z3 = np.append(depths_z3, depths_z3[-1] + remaining_thickness3 / 2)
+
+    all_depths = np.concatenate([depths_z1, depths_z2, depths_z3])
+    depths = np.sort(all_depths)[::-1]
+    stress_change = np.zeros_like(depths)
+    settelment = np.zeros_like(depths)
+
+    for i, depth in enumerate(depths):
+        a_E = a / 2
+        b_E = b / 2
+        R = np.sqrt(a_E**2 + b_E**2 + depth**2)
+        I = (1 / (2 * np.pi)) * (
+            (np.arctan((a_E * b_E) / (R * depth))) +
+            (((a_E * b_E * depth) / R) * ((1 / ((a_E**2) + (depth**2))) + (1 / ((b_E**2) + (depth**2)))))
+        )
+        stress_change[i] = 4 * I * q
+
+    sigma_i = np.zeros_like(depths)
+    sigma_f = np.zeros_like(depths)
+    sigma_p = np.zeros_like(depths)
+
+    for i, depth in enumerate(depths):
+        if depth <= z1:
+            if depth <= water_table:
+                sigma_i[i] = depth * gamma_1
+            else:
+                sigma_i[i] = water_table * gamma_1 + (depth - water_table) * (gamma_r_1 - gamma_water)
+            sigma_f[i] = sigma_i[i] + stress_change[i]
+            sigma_p[i] = OCR_1 * sigma_i[i]
+            if OCR_1 == 1:
+                delta_settlement = 1000 * (step / (1 + e_0_1)) * C_c_1 * np.log10(sigma_f[i] / sigma_i[i])
+            elif OCR_1 > 1 and sigma_f[i] <= sigma_p[i]:
+                delta_settlement = 1000 * (step / (1 + e_0_1)) * C_s_1 * np.log10(sigma_f[i] / sigma_i[i])
+            elif OCR_1 > 1 and sigma_f[i] > sigma_p[i]:
+                delta_settlement = 1000 * (step / (1 + e_0_1)) * (
+                    (C_s_1 * np.log10(sigma_p[i] / sigma_i[i])) +
+                    (C_c_1 * np.log10(sigma_f[i] / sigma_p[i]))
+                )
+        elif depth > z1 and depth <= z1 + z2:
+            if water_table > z1:
+                if depth <= water_table:
+                    sigma_i[i] = z1*gamma_1 + (depth - z1) * gamma_2
+                else:
+                    sigma_i[i] = z1*gamma_1 + (water_table-z1)*gamma_2 + (depth - water_table) * (gamma_r_2 - gamma_water)
+            else:
+                sigma_i[i] = water_table * gamma_1 + (z1 - water_table) * (gamma_r_1 - gamma_water) + (depth - z1) * (gamma_r_2 - gamma_water)
+            sigma_f[i] = sigma_i[i] + stress_change[i]
+            sigma_p[i] = OCR_2 * sigma_i[i]
+            if OCR_2 == 1:
+                delta_settlement = 1000 * (step / (1 + e_0_2)) * C_c_2 * np.log10(sigma_f[i] / sigma_i[i])
+            elif OCR_2 > 1 and sigma_f[i] <= sigma_p[i]:
+                delta_settlement = 1000 * (step / (1 + e_0_2)) * C_s_2 * np.log10(sigma_f[i] / sigma_i[i])
+            elif OCR_2 > 1 and sigma_f[i] > sigma_p[i]:
+                delta_settlement = 1000 * (step / (1 + e_0_2)) * (
+                    (C_s_2 * np.log10(sigma_p[i] / sigma_i[i])) +
+                    (C_c_2 * np.log10(sigma_f[i] / sigma_p[i]))
+                )
+        else:
+            if water_table > z1+z2:
+                if depth <= water_table:
+                    sigma_i[i] = z1*gamma_1 + z2*gamma_2 + (depth - z1 - z2) * gamma_3
+                else:
+                    sigma_i[i] = z1*gamma_1 + z2*gamma_2 + (water_table - z1 - z2) * gamma_3 + (depth - water_table) * (gamma_r_3 - gamma_water)
+            elif water_table > z1 and water_table <= z1+z2:
+                sigma_i[i] = z1*gamma_1 + (water_table-z1)*gamma_2 + (z1+z2-water_table)*(gamma_r_2-gamma_water) + (depth - z1 - z2) * (gamma_r_3 - gamma_water)
+            else:
+                sigma_i[i] = water_table * gamma_1 + (z1 - water_table) * (gamma_r_1 - gamma_water) + z2 * (gamma_r_2-gamma_water) + (depth - z1 - z2) * (gamma_r_3 - gamma_water)
+            sigma_f[i] = sigma_i[i] + stress_change[i]
+            sigma_p[i] = OCR_3 * sigma_i[i]
+            if OCR_3 == 1:
+                delta_settlement = 1000 * (step / (1 + e_0_3)) * C_c_3 * np.log10(sigma_f[i] / sigma_i[i])
+            elif OCR_3 > 1 and sigma_f[i] <= sigma_p[i]:
+                delta_settlement = 1000 * (step / (1 + e_0_3)) * C_s_3 * np.log10(sigma_f[i] / sigma_i[i])
+            elif OCR_3 > 1 and sigma_f[i] > sigma_p[i]:
+                delta_settlement = 1000 * (step / (1 + e_0_3)) * (
+                    (C_s_3 * np.log10(sigma_p[i] / sigma_i[i])) +
+                    (C_c_3 * np.log10(sigma_f[i] / sigma_p[i]))
+                )
+        settelment[i] = delta_settlement + (settelment[i-1] if i > 0 else 0)
+
+    return depths, stress_change, settelment, settelment[-1]
+
+
+def scenario(thicknesses=(4, 4, 4), water_table=1, step=1, ocr=(1, 1, 1), **fields):
+    layers = tuple(dataclasses.replace(layer, thickness=thickness, OCR=OCR)
+                   for layer, thickness, OCR in zip(DEFAULT_LAYERS, thicknesses, ocr))
+    return Scenario(sublayer_thickness=step, water_table=water_table, layers=layers, **fields)
+
+
+SCENARIOS = {
+    'default': scenario(),
+    'zero thickness middle layer': scenario(thicknesses=(4, 0, 6)),
+    'zero thickness bottom layer': scenario(thicknesses=(5, 3, 0), water_table=6),
+    'non-multiple thicknesses': scenario(thicknesses=(4.3, 2.7, 5.15), step=0.5, water_table=3.1),
+    'water table on the first boundary': scenario(water_table=4),
+    'water table on the second boundary': scenario(water_table=8, ocr=(1, 2, 1)),
+    'water table at the surface': scenario(water_table=0, step=0.25),
+    'water table below the layers': scenario(water_table=20, ocr=(1.5, 3, 6)),
+    'overconsolidated': scenario(ocr=(2, 4, 8), a=10, b=3, q=250),
+}
+
+
+@pytest.mark.parametrize('name', SCENARIOS)
+@pytest.mark.parametrize('step', [None, 0.05])
+def test_settlement_profile(name, step):
+    s = SCENARIOS[name]
+    step = s.sublayer_thickness if step is None else step
+    expected = baseline_profile(s, step)
+    for actual, wanted in zip(calculate(s, step), expected):
+        np.testing.assert_allclose(actual, wanted, rtol=RTOL)
+
+
+@pytest.mark.parametrize('name', ['default', 'non-multiple thicknesses', 'water table below the layers'])
+@pytest.mark.parametrize('step', [None, 0.05])
+def test_split_layers(name, step):
+    # Every layer split into two identical layers on a sublayer boundary, then empty layers below
+    s = SCENARIOS[name]
+    step = s.sublayer_thickness if step is None else step
+    layers = []
+    for layer in s.layers:
+        top = int(layer.thickness / 2 / step) * step
+        layers += [dataclasses.replace(layer, thickness=top),
+                   dataclasses.replace(layer, thickness=layer.thickness - top)]
+    split = dataclasses.replace(s, layers=tuple(layers) + (Layer(thickness=0),) * 2)
+    assert len(split.layers) == 8
+    for actual, wanted in zip(calculate(split, step), calculate(s, step)):
+        np.testing.assert_allclose(actual, wanted, rtol=RTOL)
+
+
+def test_record_of_many_layers():
+    record = {'z-5': 2, 'gamma_5': 20, 'OCR_5': 2, 'q': 150}
+    s = Scenario.from_record(record)
+    assert s.thicknesses == (4, 4, 4, 0, 2)
+    assert Scenario.from_record(s.to_record()) == s
+    depths, stress_change, settelment, total = calculate(s, 1)
+    assert depths[0] == pytest.approx(13.5) and len(depths) == 14
+    assert total == settelment[-1] > calculate(Scenario(q=150), 1)[3]
+
+
+
+@pytest.mark.parametrize('step', [None, 0.05])
+def test_batch_profiles(step):
+    scenarios = list(SCENARIOS.values())
+    for s, profile in zip(scenarios, batch_profiles(scenarios, step=step, chunk_size=500)):
+        for actual, wanted in zip(profile, baseline_profile(s, s.sublayer_thickness if step is None else step)):
+            np.testing.assert_allclose(actual, wanted, rtol=RTOL)
+
+@pytest.mark.parametrize('x_name, x_values, y_name, y_values', [
+    ('a', [2, 4, 7], 'q', [50, 150]),
+    ('water-table', [0, 4, 6.5], 'OCR_2', [1, 2.5]),
+    ('gamma_r_1', [18, 21], 'C_c_3', [0.1, 0.3, 0.5]),
+])
+def test_sweep_settlement(x_name, x_values, y_name, y_values):
+    s = SCENARIOS['non-multiple thicknesses']
+    settlement = sweep_settlement(s, x_name, x_values, y_name, y_values)
+    for j, y in enumerate(y_values):
+        for i, x in enumerate(x_values):
+            point = Scenario.from_record(dict(s.to_record(), **{x_name: x, y_name: y}))
+            assert settlement[j, i] == pytest.approx(baseline_profile(point, s.sublayer_thickness)[3], rel=RTOL)
+
+
+def test_sweep_settlement_in_chunks():
+    s = SCENARIOS['overconsolidated']
+    args = (s, 'q', np.linspace(50, 300, 7), 'OCR_1', np.linspace(1, 5, 5))
+    np.testing.assert_allclose(sweep_settlement(*args, chunk_size=40), sweep_settlement(*args), rtol=RTOL)
+
+
+@pytest.mark.parametrize('name', SCENARIOS)
+def test_monte_carlo_without_spread(name):
+    # With no coefficient of variation every realization is the deterministic settlement
+    s = SCENARIOS[name]
+    settlement = monte_carlo_settlement(s, {}, realizations=50, seed=0, chunk_size=60)
+    np.testing.assert_allclose(settlement, calculate(s, s.sublayer_thickness)[3], rtol=RTOL)
+
+
+@pytest.mark.parametrize('cov', [{'C_c_4': 0.1}, {'q': 0.1}])
+def test_monte_carlo_rejects_other_properties(cov):
+    with pytest.raises(ValueError):
+        monte_carlo_settlement(SCENARIOS['default'], cov, realizations=10)
+
+
+FOOTINGS = [Footing(x=0, y=0, a=4, b=2, q=100), Footing(x=6, y=1, a=2, b=3, q=200),
+            Footing(x=40, y=-5, a=3, b=3, q=150), Footing(x=-25, y=30, a=6, b=1, q=-50)]
+
+
+def exact_group_stress_change(footings, x, y, depths):
+    return sum(f.q * rectangle_influence(f.x - f.a/2 - x, f.x + f.a/2 - x, f.y - f.b/2 - y, f.y + f.b/2 - y, depths)
+               for f in footings)
+
+
+def group_points():
+    x, y, depths = np.meshgrid(np.linspace(-40, 60, 41), np.linspace(-20, 40, 31), [0.5, 3, 10, 25], indexing='ij')
+    return x, y, depths
+
+
+def test_group_stress_change_without_cutoff():
+    x, y, depths = group_points()
+    np.testing.assert_allclose(group_stress_change(FOOTINGS, x, y, depths, tolerance=1e-300),
+                               exact_group_stress_change(FOOTINGS, x, y, depths), rtol=RTOL, atol=1e-12)
+
+
+@pytest.mark.parametrize('tolerance', [0.01, 0.1, 1])
+def test_group_stress_change_cutoff_error(tolerance):
+    # Every skipped footing adds less than tolerance at a point
+    x, y, depths = group_points()
+    error = group_stress_change(FOOTINGS, x, y, depths, tolerance) - exact_group_stress_change(FOOTINGS, x, y, depths)
+    assert np.abs(error).max() < len(FOOTINGS) * tolerance
+
+
+def test_group_of_one_footing_under_point_e():
+    depths = np.linspace(0.1, 20, 50)
+    np.testing.assert_allclose(group_stress_change([Footing(x=2, y=-1, a=4, b=2, q=120)], 2, -1, depths),
+                               point_e_stress_change(depths, 4, 2, 120), rtol=RTOL)
+
+
+@pytest.mark.parametrize('name', SCENARIOS)
+def test_section_centre_is_point_e(name):
+    s = SCENARIOS[name]
+    x0, x1 = 1.5*s.a, 2.5*s.a
+    x = np.linspace(0, 4*s.a, 41)  # the centre 2a is column 20
+    settlement = calculate_section(s, s.sublayer_thickness, x, x0, x1)
+    assert settlement[20] == pytest.approx(calculate(s, s.sublayer_thickness)[3], rel=RTOL)
+    # and the section is symmetric about it
+    np.testing.assert_allclose(settlement, settlement[::-1], rtol=RTOL)
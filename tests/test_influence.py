@@ -0,0 +1,75 @@
+"""Regression tests of the section A-A influence factor grid.
+
+baseline_influence_grid is the per-column loop of the original update_graphs;
+influence_factor_grid must give the same numbers on the same grid.
+"""
+import numpy as np
+import pytest
+
+from calculations import adaptive_contour_grid, contour_grid, influence_factor_grid
+
+RTOL = 1e-9
+
+
+def baseline_influence_grid(x, z, a, b, x0_dim, x1_dim):
+    X, Z = np.meshgrid(x, z)
+    I = np.zeros_like(X)
+    b1 = b2 = b / 2
+
+    for i, x_val in enumerate(x):
+        if x_val <= x0_dim:
+            a1 = x1_dim - x_val
+            a2 = x0_dim - x_val
+        elif x_val >= x1_dim:
+            a1 = x_val - x0_dim
+            a2 = x_val - x1_dim
+        else:
+            a1 = x1_dim - x_val
+            a2 = x_val - x0_dim
+
+        R1 = np.sqrt(a1**2 + b1**2 + Z**2)
+        R2 = np.sqrt(a2**2 + b2**2 + Z**2)
+
+        I1 = (1 / (2 * np.pi)) * (
+            (np.arctan((a1 * b1) / (R1 * Z))) + (((a1 * b1 * Z) / R1) * ((1 / ((a1**2) + (Z**2))) + (1 / ((b1**2) + (Z**2)))))
+        )
+        I2 = (1 / (2 * np.pi)) * (
+            (np.arctan((a2 * b2) / (R2 * Z))) + (((a2 * b2 * Z) / R2) * ((1 / ((a2**2) + (Z**2))) + (1 / ((b2**2) + (Z**2)))))
+        )
+
+        if x_val <= x0_dim or x_val >= x1_dim:
+            I[:, i] = 2 * I1[:, i] - 2 * I2[:, i]
+        else:
+            I[:, i] = 2 * I1[:, i] + 2 * I2[:, i]
+
+    return np.where(I < 0, 0, I)
+
+
+@pytest.mark.parametrize('a, b, total_depth', [(1, 0.5, 12), (4, 2, 12), (10, 4, 60), (4, 2, 3)])
+@pytest.mark.parametrize('symmetric', [False, True])
+def test_influence_factor_grid(a, b, total_depth, symmetric):
+    x0, x1 = 1.5*a, 2.5*a
+    x, z = contour_grid(a, total_depth, x0, x1)
+    np.testing.assert_allclose(influence_factor_grid(x, z, a, b, x0, x1, symmetric=symmetric),
+                               baseline_influence_grid(x, z, a, b, x0, x1), rtol=RTOL, atol=1e-12)
+
+
+def test_symmetric_grid_off_centre_points():
+    # Columns without a mirror image on the grid are evaluated too
+    a, b, x0, x1 = 4, 2, 6, 10
+    x = np.array([-1.0, 3.3, 6.0, 7.9, 8.0, 9.2, 10.0, 15.5])
+    z = np.linspace(0.000000001, 12, 50)
+    np.testing.assert_allclose(influence_factor_grid(x, z, a, b, x0, x1, symmetric=True),
+                               baseline_influence_grid(x, z, a, b, x0, x1), rtol=RTOL, atol=1e-12)
+
+
+@pytest.mark.parametrize('budget', [2500, 20000])
+def test_adaptive_contour_grid(budget):
+    a, b, total_depth = 4, 2, 12
+    x0, x1 = 1.5*a, 2.5*a
+    x, z = adaptive_contour_grid(a, b, total_depth, x0, x1, budget=budget)
+    assert x.size * z.size <= budget
+    np.testing.assert_allclose(x + x[::-1], x0 + x1, rtol=RTOL)
+    assert np.all(np.diff(x) > 0) and np.all(np.diff(z) > 0)
+    np.testing.assert_allclose(influence_factor_grid(x, z, a, b, x0, x1, symmetric=True),
+                               baseline_influence_grid(x, z, a, b, x0, x1), rtol=RTOL, atol=1e-12)
@@ -0,0 +1,62 @@
+import dataclasses
+import time
+
+import numpy as np
+import pytest
+
+from calculations import (DEFAULT_LAYERS, QUADRATURE_MAX_INTERVALS, Scenario, _adaptive_gauss_kronrod,
+                          _find_crossing, calculate, calculate_quadrature)
+
+
+def with_layer(index, **changes):
+    layers = list(DEFAULT_LAYERS)
+    layers[index] = dataclasses.replace(layers[index], **changes)
+    return tuple(layers)
+
+
+@pytest.mark.parametrize('s', [
+    Scenario(),
+    Scenario(water_table=5, layers=tuple(dataclasses.replace(layer, OCR=OCR)
+                                         for layer, OCR in zip(DEFAULT_LAYERS, (2, 3, 1.5)))),
+    Scenario(water_table=0, a=10, b=3, q=250),
+])
+def test_quadrature_matches_fine_profile(s):
+    settlement, error, _ = calculate_quadrature(s)
+    # The midpoint sum of calculate converges to the integral as the sublayers get thinner
+    assert settlement == pytest.approx(calculate(s, 0.0005)[3], abs=0.01)
+    assert error < 1e-2
+
+
+@pytest.mark.parametrize('s', [
+    Scenario(q=-100),
+    Scenario(a=float('nan')),
+    Scenario(layers=with_layer(0, e_0=-1)),
+    Scenario(layers=with_layer(0, gamma=0)),
+    Scenario(q=-50, layers=with_layer(0, OCR=3)),
+])
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_quadrature_of_invalid_input_is_nan(s):
+    start = time.perf_counter()
+    settlement, error, evaluations = calculate_quadrature(s)
+    assert np.isnan(settlement) and np.isnan(error)
+    assert evaluations < 15 * QUADRATURE_MAX_INTERVALS
+    assert time.perf_counter() - start < 1
+
+
+def test_quadrature_stops_at_the_interval_cap():
+    # A tolerance of zero is never met
+    integral, _, evaluations = _adaptive_gauss_kronrod(np.sqrt, 0.0, 1.0, 0.0)
+    assert integral == pytest.approx(2 / 3)
+    assert evaluations <= 15 * QUADRATURE_MAX_INTERVALS
+
+
+@pytest.mark.parametrize('lo, hi', [(0.5, 3.0), (1e-9, 3.0)])
+def test_find_crossing(lo, hi):
+    root, evaluations = _find_crossing(lambda z: 2 - z**2, lo, hi)
+    assert root == pytest.approx(np.sqrt(2), rel=1e-9)
+    assert evaluations < 70
+
+
+def test_find_crossing_without_finite_values():
+    root, _ = _find_crossing(lambda z: np.full_like(np.asarray(z, dtype=float), np.nan), 0.5, 1.0)
+    assert np.isnan(root)
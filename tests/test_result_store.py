@@ -0,0 +1,111 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+import result_store
+from result_store import MANIFEST, ResultStore, result_key
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_store, 'RESULT_STORE', True)
+    return ResultStore(str(tmp_path), max_bytes=2**30, max_age=3600)
+
+
+def put(store, name, size=100):
+    key = result_key('test', name)
+    store.put(key, {'values': np.arange(size, dtype=float)})
+    return key
+
+
+def last_used(store, key, seconds_ago):
+    used = time.time() - seconds_ago
+    os.utime(store._path(key), (used, used))
+
+
+def test_hit_after_put(store):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'values': np.linspace(0, 1, 5), 'scale': np.array(2.0)}
+
+    first = store.get_or_compute('test', {'a': 1, 'b': [1, 2]}, compute)
+    second = store.get_or_compute('test', {'b': [1, 2], 'a': 1}, compute)
+    assert len(calls) == 1
+    np.testing.assert_array_equal(second['values'], first['values'])
+    assert float(second['scale']) == 2.0
+    assert isinstance(second['values'], np.memmap)
+    info = store.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+
+@pytest.mark.parametrize('missing', [MANIFEST, 'values.npy'])
+def test_incomplete_entry_is_a_miss(store, missing):
+    key = put(store, 'incomplete')
+    assert store.cache_info().currsize == 1
+    os.remove(os.path.join(store._path(key), missing))
+
+    assert store.get(key) is None
+    assert not os.path.exists(store._path(key))
+    assert store.cache_info().currsize == 0
+    # and it can be stored again
+    put(store, 'incomplete', size=10)
+    assert len(store.get(key)['values']) == 10
+
+
+def test_second_put_keeps_the_first_entry(store):
+    key = put(store, 'twice', size=3)
+    put(store, 'twice', size=5)
+    assert len(store.get(key)['values']) == 3
+    assert store.cache_info().currsize == 1
+    # No temporary directory is left behind
+    assert os.listdir(os.path.dirname(store._path(key))) == [key]
+
+
+def test_failed_write_is_discarded(store):
+    key = result_key('test', 'failed')
+    with pytest.raises(RuntimeError):
+        with store.writing(key, ['values']):
+            raise RuntimeError('compute failed')
+    assert store.get(key) is None
+    assert os.listdir(os.path.dirname(store._path(key))) == []
+
+
+def test_eviction_by_age(store):
+    old, recent = put(store, 'old'), put(store, 'recent')
+    last_used(store, old, 2 * store.max_age)
+    assert store.evict() == 1
+    assert store.get(old) is None
+    assert store.get(recent) is not None
+    assert store.cache_info().currsize == 1
+
+
+def test_eviction_of_the_least_recently_used(store):
+    keys = [put(store, name) for name in 'abcd']
+    for age, key in enumerate(keys):
+        last_used(store, key, 10 * (len(keys) - age))
+    # Reading an entry makes it the most recently used
+    store.get(keys[0])
+    entry_bytes = max(size for _, _, size, _ in store._entries())
+    store.max_bytes = 2 * entry_bytes
+
+    assert store.evict() == 2
+    assert [store.get(key) is not None for key in keys] == [True, False, False, True]
+    assert store.cache_info().currsize == 2
+
+
+def test_stale_partial_entries_are_removed(store, monkeypatch):
+    key = put(store, 'kept')
+    partial = os.path.join(os.path.dirname(store._path(key)), f'.{key}.partial')
+    os.mkdir(partial)
+    assert store.evict() == 0
+    assert os.path.isdir(partial)
+    assert store.cache_info().currsize == 1
+
+    monkeypatch.setattr(result_store, 'PARTIAL_MAX_AGE', -1)
+    store.evict()
+    assert not os.path.exists(partial)
+    assert store.get(key) is not None
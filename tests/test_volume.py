@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import volume
+from calculations import Footing, group_stress_change
+from result_store import ResultStore
+
+FOOTINGS = [Footing(x=0, y=0, a=4, b=2, q=100), Footing(x=5, y=1, a=2, b=2, q=150)]
+X = np.linspace(-4, 8, 13)
+Y = np.linspace(-3, 4, 8)
+Z = np.linspace(0.5, 10, 20)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path))
+
+
+def test_plan_slice_matches_group_stress_change(store):
+    key = volume.compute_volume(FOOTINGS, X, Y, Z, store=store, chunk_size=250)
+    x, y, depth, stress = volume.plan_slice(key, 4.9, store=store)
+    assert depth == pytest.approx(5.0)
+    np.testing.assert_array_equal(x, X)
+    np.testing.assert_allclose(stress, group_stress_change(FOOTINGS, X[np.newaxis, :], Y[:, np.newaxis], 5.0),
+                               rtol=1e-6, atol=1e-4)
+
+
+def test_stored_volume_is_reused(store, monkeypatch):
+    key = volume.compute_volume(FOOTINGS, X, Y, Z, store=store)
+    monkeypatch.setattr(volume, 'group_stress_change', None)
+    assert volume.compute_volume(FOOTINGS, X, Y, Z, store=store) == key
+
+
+def test_key_depends_on_the_engine_version(monkeypatch):
+    key = volume.volume_key(FOOTINGS, X, Y, Z)
+    assert volume.is_volume_key(key)
+    monkeypatch.setattr(volume, 'engine_version', lambda: 'changed')
+    assert volume.volume_key(FOOTINGS, X, Y, Z) != key
+
+
+@pytest.mark.parametrize('key', ['../../etc/passwd', 'A' * 32, 'a' * 31, None, 5])
+def test_only_volume_keys_are_loaded(store, key):
+    with pytest.raises(KeyError):
+        volume.load_volume(key, store=store)
+
+
+def test_missing_volume(store):
+    with pytest.raises(KeyError):
+        volume.plan_slice('0' * 32, 1.0, store=store)
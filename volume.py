@@ -0,0 +1,113 @@
+"""3D stress volume below a group of footings, computed in depth chunks.
+
+compute_volume evaluates the stress increase on an (x, y, z) grid a few depth
+slices at a time and writes each chunk straight into a memory-mapped .npy
+file, so the whole volume never has to fit in memory. Volumes and their grid
+axes are entries of a ResultStore of their own, under a key of their inputs
+and of the calculation code (engine_version): plan_slice reads one depth
+slice of a stored volume without recomputing it, and the least recently used
+volumes are evicted like other stored results.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+import numpy as np
+
+from calculations import STRESS_TOLERANCE, group_stress_change
+from result_store import ResultStore, engine_version
+
+# Directory of the stored volumes
+VOLUME_DIR = os.environ.get('VOLUME_DIR', os.path.join(tempfile.gettempdir(), 'stress_in_soils_volumes'))
+
+# Volumes unused for this many seconds, or beyond this many bytes, are evicted
+VOLUME_MAX_BYTES = int(os.environ.get('VOLUME_MAX_BYTES', 4 << 30))
+VOLUME_MAX_AGE = int(os.environ.get('VOLUME_MAX_AGE', 7 * 24 * 3600))
+
+# Grid points evaluated at once; a chunk needs about 170 bytes of temporaries per point
+VOLUME_CHUNK_SIZE = int(os.environ.get('VOLUME_CHUNK_SIZE', 500_000))
+
+# kPa to a few significant digits is all the plan views show
+VOLUME_DTYPE = np.float32
+
+# Keys made by volume_key; anything else, e.g. from the browser, is not looked up
+VOLUME_KEY = re.compile(r'[0-9a-f]{32}')
+
+VOLUME_ARRAYS = ('volume', 'x', 'y', 'z')
+
+volume_store = ResultStore(VOLUME_DIR, VOLUME_MAX_BYTES, VOLUME_MAX_AGE)
+
+
+def volume_key(footings, x, y, z, tolerance=STRESS_TOLERANCE):
+    # Same inputs and code, same entry: the hash of the footings, the grid axes and engine_version
+    inputs = {
+        'footings': [[f.x, f.y, f.a, f.b, f.q] for f in footings],
+        'axes': [np.asarray(axis, dtype=float).tolist() for axis in (x, y, z)],
+        'tolerance': tolerance,
+        'dtype': np.dtype(VOLUME_DTYPE).str,
+        'version': engine_version(),
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+
+def is_volume_key(key):
+    return isinstance(key, str) and VOLUME_KEY.fullmatch(key) is not None
+
+
+def compute_volume(footings, x, y, z, tolerance=STRESS_TOLERANCE, store=None, chunk_size=VOLUME_CHUNK_SIZE,
+                   progress=None):
+    """Stress increase below the footings on the grid x, y, z, stored as (z, y, x).
+
+    Returns the key of the stored volume. A volume that is already stored is
+    not computed again. It is written into a temporary entry of store
+    (volume_store by default) that is renamed once complete, so a reader
+    never sees a partial volume. progress, if given, is called with the
+    fraction done after each chunk of depths.
+    """
+    store = store or volume_store
+    x, y, z = (np.asarray(axis, dtype=float) for axis in (x, y, z))
+    key = volume_key(footings, x, y, z, tolerance)
+    if store.get(key) is not None:
+        return key
+
+    with store.writing(key, VOLUME_ARRAYS) as partial:
+        volume = np.lib.format.open_memmap(os.path.join(partial, 'volume.npy'), mode='w+', dtype=VOLUME_DTYPE,
+                                           shape=(z.size, y.size, x.size))
+        depths_per_chunk = max(1, chunk_size // (x.size * y.size))
+        for start in range(0, z.size, depths_per_chunk):
+            depths = z[start:start + depths_per_chunk]
+            volume[start:start + depths.size] = group_stress_change(
+                footings, x[np.newaxis, np.newaxis, :], y[np.newaxis, :, np.newaxis],
+                depths[:, np.newaxis, np.newaxis], tolerance)
+            if progress:
+                progress((start + depths.size) / z.size)
+        volume.flush()
+        del volume
+        for name, axis in (('x', x), ('y', y), ('z', z)):
+            np.save(os.path.join(partial, f'{name}.npy'), axis)
+    return key
+
+
+def load_volume(key, store=None):
+    """(x, y, z, volume) of a stored volume; volume is a read-only memory map of shape (z, y, x).
+
+    Raises KeyError if there is no such volume, e.g. since it was evicted.
+    """
+    if not is_volume_key(key):
+        raise KeyError(f'Not a volume key: {key!r}')
+    arrays = (store or volume_store).get(key)
+    if arrays is None:
+        raise KeyError(f'No stored volume {key}')
+    return tuple(arrays[name] for name in ('x', 'y', 'z', 'volume'))
+
+
+def plan_slice(key, depth, store=None):
+    """(x, y, depth, stress) of the stored depth slice nearest to depth.
+
+    The volume is stored depth-major, so a slice is one contiguous read.
+    """
+    x, y, z, volume = load_volume(key, store)
+    i = int(np.argmin(np.abs(z - depth)))
+    return np.array(x), np.array(y), float(z[i]), np.array(volume[i], dtype=float)